@@ -0,0 +1,129 @@
+# bench_emotion_weights.py
+"""get_emotion_weights: compiled one-pass matcher vs the old substring scan.
+
+Checks first that derived forms ("sadly", "worries") are credited. Then
+builds chat-like messages of several lengths from filler words, emotion
+keywords (some inflected or derived) and words that merely contain a
+keyword ("made", "beheld", "safety"), times both implementations on the
+same messages, counts how often their results differ and lists the words
+behind the differences.
+
+    python bench_emotion_weights.py --lengths 5 20 60 200 --messages 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+from collections import Counter
+from time import perf_counter
+
+try:
+    from backend.api.emotion_weights import EMOTION_KEYWORDS, get_emotion_weights
+except ImportError:
+    from emotion_weights import EMOTION_KEYWORDS, get_emotion_weights
+
+FILLER = (
+    "i you it the a and to of just really so today feel like was that my work "
+    "friend home think know day night thing talk about what why when but not"
+).split()
+# Contain a keyword without being one: the substring scan fires on these
+LOOKALIKES = ["made", "beheld", "safety", "misspelled", "believer", "tearoom", "hurtle", "wishbone"]
+# Derived forms both implementations should credit (the substring scan does by containment)
+DERIVED = ["sadly", "anxiously", "nervously", "gratefully", "sadness", "panicked", "panicking", "worries", "stressful"]
+KEYWORD_RATE = 0.08
+LOOKALIKE_RATE = 0.03
+DERIVED_RATE = 0.02
+
+
+def substring_weights(text: str) -> dict:
+    """The previous implementation: one `in` scan per keyword."""
+    weights = {}
+    text = text.lower()
+    for emotion, keywords in EMOTION_KEYWORDS.items():
+        score = 0
+        for word, weight in keywords.items():
+            if word in text:
+                score = max(score, weight)
+        if score > 0:
+            weights[emotion] = round(score, 2)
+    return weights
+
+
+def _messages(n_words: int, count: int, rng: random.Random) -> list[str]:
+    keywords = [w for words in EMOTION_KEYWORDS.values() for w in words]
+    messages = []
+    for _ in range(count):
+        words = []
+        for _ in range(n_words):
+            roll = rng.random()
+            if roll < KEYWORD_RATE:
+                words.append(rng.choice(keywords) + rng.choice(["", "", "s", "ing"]))
+            elif roll < KEYWORD_RATE + LOOKALIKE_RATE:
+                words.append(rng.choice(LOOKALIKES))
+            elif roll < KEYWORD_RATE + LOOKALIKE_RATE + DERIVED_RATE:
+                words.append(rng.choice(DERIVED))
+            else:
+                words.append(rng.choice(FILLER))
+        messages.append(" ".join(words))
+    return messages
+
+
+def _differing_words(messages: list[str]) -> Counter:
+    """Words the two implementations score differently, over messages whose results differ."""
+    words = Counter()
+    for text in messages:
+        if substring_weights(text) != get_emotion_weights(text):
+            words.update(w for w in text.split() if substring_weights(w) != get_emotion_weights(w))
+    return words
+
+
+def _time(fn, messages: list[str]) -> list[float]:
+    for text in messages[:50]:      # warm-up
+        fn(text)
+    latencies = []
+    for text in messages:
+        started = perf_counter()
+        fn(text)
+        latencies.append((perf_counter() - started) * 1e6)
+    return latencies
+
+
+def _summary(latencies: list[float]) -> str:
+    latencies = sorted(latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    return f"p50 {statistics.median(latencies):8.2f} us   p95 {p95:8.2f} us"
+
+
+def _check_derived() -> list[str]:
+    """Derived forms the compiled matcher misses, though a keyword is inside them."""
+    return [word for word in DERIVED if not get_emotion_weights(word)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[5, 20, 60, 200])
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args()
+
+    missed = _check_derived()
+    print(f"derived forms missed: {', '.join(missed) if missed else 'none'}")
+
+    rng = random.Random(0)
+    for n_words in args.lengths:
+        messages = _messages(n_words, args.messages, rng)
+        old = _time(substring_weights, messages)
+        new = _time(get_emotion_weights, messages)
+        differ = sum(substring_weights(m) != get_emotion_weights(m) for m in messages)
+        words = ", ".join(f"{w} ({n})" for w, n in _differing_words(messages).most_common(8))
+        print(f"\n{n_words}-word messages ({args.messages})")
+        print(f"  substring {_summary(old)}")
+        print(f"  compiled  {_summary(new)}   ({statistics.median(old) / statistics.median(new):.1f}x)")
+        print(f"  results differ on {differ} messages")
+        if words:
+            print(f"  words scored differently: {words}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,9 @@ These emotional weights were calculated by using the National Research Council f
  be refined over time through individual effort and analysis. Additional studies and systems may be used over time as 
  well to create more accurate/authentic modeling
 """
+import string
+from collections import defaultdict
+
 EMOTION_KEYWORDS = {
     "sadness": {
         "sad": 0.6, "depressed": 0.9, "cry": 0.8, "tear": 0.7,
@@ -17,7 +20,7 @@ EMOTION_KEYWORDS = {
     },
     "anxiety": {
         "anxious": 0.8, "nervous": 0.6, "panic": 0.9, "worry": 0.6,
-        "overwhelmed": 0.7, "stressed": 0.7, "uneasy": 0.5,
+        "overwhelmed": 0.7, "stressed": 0.7, "stressful": 0.7, "uneasy": 0.5,
     },
     "emptiness": {
         "empty": 0.9, "numb": 0.8, "hollow": 0.9, "void": 0.7,
@@ -56,14 +59,76 @@ EMOTION_KEYWORDS = {
         "aching for": 0.9, "wish": 0.6, "nostalgic": 0.6,
     },
 }
+
+# Inflections a keyword may carry ("cry" -> "crying", "miss" -> "missed"). Matching
+# whole words keeps "mad" out of "made" and "held" out of "beheld".
+_SUFFIXES = ("", "s", "es", "d", "ed", "ing")
+# Derived forms on top of the plain suffixes ("sad" -> "sadness", "fear" -> "fearful",
+# "nervous" -> "nervously")
+_DERIVATIONS = ("ness", "ful", "ly")
+_VOWELS = set("aeiou")
+# Punctuation becomes whitespace, so str.split() yields whole words
+_SEPARATORS = str.maketrans({c: " " for c in string.punctuation + "\u2018\u2019\u201c\u201d\u2026\u2013\u2014"})
+
+def _inflections(word: str) -> set:
+    """Word forms credited to a single-word keyword.
+
+    The plain suffixes and -ness/-ful/-ly, plus the spelling changes they
+    bring: a doubled final consonant ("fret" -> "fretting", "panic" ->
+    "panicked"), consonant+y -> i ("worry" -> "worries", "empty" ->
+    "emptiness") and a dropped silent e ("crave" -> "craving").
+    """
+    forms = {word + suffix for suffix in _SUFFIXES + _DERIVATIONS}
+    if word.endswith("ic"):
+        forms.update(word + "k" + suffix for suffix in ("ed", "ing", "s", "y"))
+    elif (
+        len(word) >= 3 and word[-1] not in _VOWELS | set("wxy")
+        and word[-2] in _VOWELS and word[-3] not in _VOWELS
+    ):
+        forms.update(word + word[-1] + suffix for suffix in ("ed", "ing"))
+    if len(word) >= 2 and word.endswith("y") and word[-2] not in _VOWELS:
+        stem = word[:-1] + "i"
+        forms.update(stem + suffix for suffix in ("es", "ed", "ness", "ly"))
+    if word.endswith("e") and not word.endswith("ee"):
+        forms.add(word[:-1] + "ing")
+    return forms
+
+def _compile(keywords: dict):
+    """Index every keyword form once, so a message is matched in one tokenizing pass.
+
+    Returns (word form -> [(emotion, weight)], first word -> [(phrase,
+    [(emotion, weight)])]) for single-word and multi-word keys respectively.
+    """
+    credits = defaultdict(list)
+    for emotion, words in keywords.items():
+        for word, weight in words.items():
+            credits[tuple(word.lower().split())].append((emotion, weight))
+
+    forms, phrases = defaultdict(list), defaultdict(list)
+    for words, credit in credits.items():
+        if len(words) == 1:
+            for form in _inflections(words[0]):
+                forms[form].extend(credit)
+        else:
+            phrases[words[0]].append((f" {' '.join(words)} ", credit))
+    return dict(forms), dict(phrases)
+
+_FORMS, _PHRASES = _compile(EMOTION_KEYWORDS)
+_INDEX = frozenset(_FORMS) | frozenset(_PHRASES)
+
 def get_emotion_weights(text: str) -> dict:
-    weights = {}
-    text = text.lower()
-    for emotion, keywords in EMOTION_KEYWORDS.items():
-        score = 0
-        for word, weight in keywords.items():
-            if word in text:
-                score = max(score, weight)
-        if score > 0:
-            weights[emotion] = round(score, 2)
-    return weights
+    """Highest keyword weight per emotion category found in `text`."""
+    tokens = text.lower().translate(_SEPARATORS).split()
+    scores = {}
+    for token in _INDEX.intersection(tokens):
+        credit = list(_FORMS.get(token, ()))
+        if token in _PHRASES:
+            # Single spaces between whole tokens, so containment means a word-aligned phrase
+            joined = f" {' '.join(tokens)} "
+            for phrase, phrase_credit in _PHRASES[token]:
+                if phrase in joined:
+                    credit.extend(phrase_credit)
+        for emotion, weight in credit:
+            if weight > scores.get(emotion, 0):
+                scores[emotion] = weight
+    return {emotion: round(scores[emotion], 2) for emotion in EMOTION_KEYWORDS if emotion in scores}
@@ -21,16 +21,15 @@ from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, Depends, H
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse, FileResponse
+from fastapi.responses import RedirectResponse, FileResponse, JSONResponse
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import json
 import uuid
 from pydantic import BaseModel
 from pathlib import Path
-from time import time
+from time import time, perf_counter
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
 from tenacity import retry, stop_after_attempt, wait_exponential
 import structlog
 
@@ -45,17 +44,23 @@ except ImportError:
     except ImportError:
         # Create a simple fallback
         class EmbeddingPipeline:
-            def __init__(self):
+            def __init__(self, *args, **kwargs):
                 pass
+            def load(self):
+                return None
+            def stats(self):
+                return {}
             def encode_conversation(self, user_msg: str, ai_response: str):
                 return [0.0] * 384  # Default embedding size
+            def encode_many(self, texts: list):
+                return [[0.0] * 384 for _ in texts]
 
 import chromadb
 
 from collections import defaultdict
 
 from threading import Thread
-from typing import List, Dict, Callable, Optional
+from typing import List, Dict, Awaitable, Callable, Optional
 import os, re, torch
 from datetime import datetime, timedelta
 
@@ -64,7 +69,6 @@ from dotenv import load_dotenv
 from transformers import (
     AutoTokenizer,
     AutoModelForCausalLM,
-    pipeline,
     BitsAndBytesConfig,
 )
 
@@ -74,7 +78,9 @@ from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 try:
     from backend.inference.affect import Affect_State
     from backend.memory.memory_store import Memory_Store
+    from backend.memory.sql_memory_store import SqlMemoryStore
     from backend.memory.vector_memory_store import VectorMemoryStore
+    from backend.memory.numpy_vector_store import NumpyVectorMemoryStore
     from backend.memory.eden_memory_defender import (
         is_sexualized_prompt,
         is_racist_prompt,
@@ -89,7 +95,9 @@ except ImportError:
     try:
         from affect import Affect_State
         from memory_store import Memory_Store
+        from sql_memory_store import SqlMemoryStore
         from vector_memory_store import VectorMemoryStore
+        from numpy_vector_store import NumpyVectorMemoryStore
         from eden_memory_defender import (
             is_sexualized_prompt,
             is_racist_prompt,
@@ -112,7 +120,7 @@ except ImportError:
                 return self.states[(session_id, persona)]
 
         class Memory_Store:
-            def __init__(self):
+            def __init__(self, *args, **kwargs):
                 self.sessions = defaultdict(list)
             def save(self, speaker: str, message: str, emotion: str = "neutral", tags: list = None, session_id: str = "default"):
                 entry = {
@@ -135,14 +143,51 @@ except ImportError:
                 self.sessions[session_id] = []
             def clear_all(self):
                 self.sessions.clear()
+            def list_sessions(self):
+                return list(self.sessions.keys())
+            def close(self):
+                pass
+            async def asave(self, *args, **kwargs):
+                self.save(*args, **kwargs)
+            async def aget_recent(self, *args, **kwargs):
+                return self.get_recent(*args, **kwargs)
+            async def acount_tag(self, *args, **kwargs):
+                return self.count_tag(*args, **kwargs)
+            async def aclear(self, *args, **kwargs):
+                self.clear(*args, **kwargs)
+            async def aclear_all(self):
+                self.clear_all()
+
+        # The in-RAM stub stands in for every memory backend
+        SqlMemoryStore = Memory_Store
 
         class VectorMemoryStore:
-            def __init__(self):
+            def __init__(self, *args, **kwargs):
                 pass
-            def save_interaction(self, user_msg: str, ai_response: str, emotional_data: dict, session_id: str):
+            def save_interaction(self, user_msg: str, ai_response: str, emotional_data: dict, session_id: str, turn=None):
                 pass
-            def get_contextual_memory(self, query: str, session_id: str, limit: int = 3):
+            def get_contextual_memory(self, query: str, session_id: str, limit: int = 3, turn=None):
                 return []
+            def begin_turn(self, user_msg: str):
+                return None
+            async def asave_interaction(self, *args, **kwargs):
+                pass
+            async def aget_contextual_memory(self, *args, **kwargs):
+                return []
+            async def aget_emotion_summary(self, session_id: str):
+                return {"session_id": session_id, "total_interactions": 0, "emotional_breakdown": {}}
+            def count(self):
+                return 0
+            def needs_rebuild(self):
+                return False
+            def rebuild_from(self, *args, **kwargs):
+                return 0
+            def migrate_emotion_metadata(self, *args, **kwargs):
+                return 0
+            def close(self):
+                pass
+
+        NumpyVectorMemoryStore = VectorMemoryStore
 
         def is_sexualized_prompt(text: str) -> bool:
             return False
@@ -164,6 +209,20 @@ except ImportError:
         def stop_scheduler():
             pass
 
+try:
+    from backend.inference.worker import InferenceWorker, InferenceQueueFull
+    from backend.inference.backends import GenerationBackend, TransformersBackend, LlamaCppBackend, PipelineBackend
+    from backend.inference.kv_cache import persona_prefix
+except ImportError:
+    from inference.worker import InferenceWorker, InferenceQueueFull
+    from inference.backends import GenerationBackend, TransformersBackend, LlamaCppBackend, PipelineBackend
+    from inference.kv_cache import persona_prefix
+
+try:
+    from backend.model_registry import registry as model_registry
+except ImportError:
+    from model_registry import registry as model_registry
+
 # Local imports
 try:
     from emotion_weights import get_emotion_weights
@@ -234,69 +293,188 @@ BASE_DIR = Path(__file__).resolve().parent
 STATIC_DIR = BASE_DIR / "static"
 
 
-# ---------------------------------------------------------------------------
-# Async ChromaDB operations
-# ---------------------------------------------------------------------------
-
-executor = ThreadPoolExecutor(max_workers=4)
-
-async def save_interaction_async(vector_store, *args, **kwargs):
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(
-        executor,
-        vector_store.save_interaction,
-        *args,
-        **kwargs
-    )
-
 # ---------------------------------------------------------------------------
 # Shared state
 # ---------------------------------------------------------------------------
 
 # Pulls Affect_State and Memory_Store classes and creates class instances in API
+# MEMORY_BACKEND=sqlite keeps history in MEMORY_DB instead of process RAM
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "json").lower()
+MEMORY_DB = os.getenv("MEMORY_DB", "eden_memory.db")
+MEMORY_MAX_RESIDENT = int(os.getenv("MEMORY_MAX_RESIDENT", "1000"))
+# Write-behind: saves return once in RAM; a background thread appends them in groups
+MEMORY_WRITE_BEHIND = os.getenv("MEMORY_WRITE_BEHIND", "1") == "1"
+MEMORY_FLUSH_MS = float(os.getenv("MEMORY_FLUSH_MS", "50"))
+MEMORY_FLUSH_RECORDS = int(os.getenv("MEMORY_FLUSH_RECORDS", "256"))
+MEMORY_FSYNC = os.getenv("MEMORY_FSYNC", "never")   # never | commit
+# Threads behind the stores' awaitable methods, so blocking I/O and embedding stay off the event loop
+MEMORY_IO_WORKERS = int(os.getenv("MEMORY_IO_WORKERS", "4"))
+VECTOR_IO_WORKERS = int(os.getenv("VECTOR_IO_WORKERS", "4"))
+# Embedding micro-batching: up to EMBED_MAX_BATCH texts, waiting at most EMBED_MAX_WAIT_MS
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "32"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+# Embedding cache bounds; EMBED_CACHE_PATH (e.g. embedding_cache.npz) keeps it across restarts
+EMBED_CACHE_ENTRIES = int(os.getenv("EMBED_CACHE_ENTRIES", "10000"))
+EMBED_CACHE_MB = float(os.getenv("EMBED_CACHE_MB", "64"))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH") or None
+# "chroma" (persistent HNSW collection) or "numpy" (in-process per-session matrices,
+# repopulated from Memory_Store with VECTOR_REBUILD_IF_EMPTY=1)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+# On-disk Chroma collection; VECTOR_DB_PATH="" keeps it in memory (lost on restart)
+VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH", "eden_vectors") or None
+# Re-embed Memory_Store history at startup when the collection is empty (e.g. first persistent
+# run). A collection written under another embedding variant is always re-embedded.
+VECTOR_REBUILD_IF_EMPTY = os.getenv("VECTOR_REBUILD_IF_EMPTY", "0") == "1"
+# Add typed emotion_<name>/dominant_emotion metadata to rows stored before those fields existed
+VECTOR_MIGRATE_EMOTIONS = os.getenv("VECTOR_MIGRATE_EMOTIONS", "1") == "1"
+# Write-behind: interactions are embedded and inserted in batches; pending ones stay searchable
+VECTOR_WRITE_BEHIND = os.getenv("VECTOR_WRITE_BEHIND", "1") == "1"
+VECTOR_FLUSH_MS = float(os.getenv("VECTOR_FLUSH_MS", "100"))
+VECTOR_FLUSH_ITEMS = int(os.getenv("VECTOR_FLUSH_ITEMS", "64"))
+# What stored vectors embed: "user" (reuses the turn's query vector), "user+reply" or "conversation"
+VECTOR_EMBEDDING_VARIANT = os.getenv("VECTOR_EMBEDDING_VARIANT", "user").lower()
+# torch (fp32) or onnx-int8 (exported and accuracy-checked once, then cached on disk)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch").lower()
+EMBED_ONNX_QCONFIG = os.getenv("EMBED_ONNX_QCONFIG", "avx2")
+
 affect = Affect_State()
-memory_store = Memory_Store()
-vector_store = VectorMemoryStore()
+memory_store = (
+    SqlMemoryStore(MEMORY_DB, io_workers=MEMORY_IO_WORKERS) if MEMORY_BACKEND == "sqlite"
+    else Memory_Store(
+        max_resident_sessions=MEMORY_MAX_RESIDENT,
+        write_behind=MEMORY_WRITE_BEHIND,
+        flush_interval_ms=MEMORY_FLUSH_MS,
+        flush_max_records=MEMORY_FLUSH_RECORDS,
+        fsync=MEMORY_FSYNC,
+        io_workers=MEMORY_IO_WORKERS,
+    )
+)
+embedding_pipeline = EmbeddingPipeline(
+    max_batch_size=EMBED_MAX_BATCH,
+    max_wait_ms=EMBED_MAX_WAIT_MS,
+    cache_entries=EMBED_CACHE_ENTRIES,
+    cache_mb=EMBED_CACHE_MB,
+    cache_path=EMBED_CACHE_PATH,
+    backend=EMBED_BACKEND,
+    onnx_qconfig=EMBED_ONNX_QCONFIG,
+)
+vector_write_behind = dict(
+    write_behind=VECTOR_WRITE_BEHIND,
+    flush_interval_ms=VECTOR_FLUSH_MS,
+    flush_max_items=VECTOR_FLUSH_ITEMS,
+    embedding_variant=VECTOR_EMBEDDING_VARIANT,
+)
+vector_store = (
+    NumpyVectorMemoryStore(
+        io_workers=VECTOR_IO_WORKERS, embedding_pipeline=embedding_pipeline, **vector_write_behind
+    )
+    if VECTOR_BACKEND == "numpy"
+    else VectorMemoryStore(
+        io_workers=VECTOR_IO_WORKERS, embedding_pipeline=embedding_pipeline, path=VECTOR_DB_PATH, **vector_write_behind
+    )
+)
 
 # ---------------------------------------------------------------------------
 # Model & tokenizer
 # ---------------------------------------------------------------------------
 MODEL_NAME = 'HuggingFaceH4/zephyr-7b-beta'
 
-# Allows for 4-bit quantization through BitsAndBytesConfig
-quant_cfg = BitsAndBytesConfig(load_in_4bit=True, bnb_4bit_compute_dtype=torch.float16)
-
-print(f"[STARTUP] Loading model {MODEL_NAME}...")
-try:
-    _tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, token=HF_TOKEN)
-    _model = AutoModelForCausalLM.from_pretrained(
+# "transformers" runs the HF model in-process; "llamacpp" sends turns to a
+# llama.cpp server (e.g. a GGUF Q4 Zephyr on CPU-only hosts)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "transformers").lower()
+LLAMACPP_URL = os.getenv("LLAMACPP_URL", "http://localhost:8080")
+# Slots the server decodes at once (its --parallel); one worker thread per slot
+LLAMACPP_PARALLEL = int(os.getenv("LLAMACPP_PARALLEL", "8"))
+# How long warm start waits for the server to finish loading its model
+LLAMACPP_READY_TIMEOUT_S = float(os.getenv("LLAMACPP_READY_TIMEOUT_S", "600"))
+
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "1"))
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "32"))
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "8"))
+INFERENCE_BATCH_WINDOW_MS = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "25"))
+SESSION_KV_CACHE_MB = int(os.getenv("SESSION_KV_CACHE_MB", "512"))
+# Serve canned DummyGenerator replies when the LLM fails to load (local dev only);
+# otherwise a load failure leaves /ready at 503
+ALLOW_DUMMY_BACKEND = os.getenv("ALLOW_DUMMY_BACKEND", "0") == "1"
+
+class DummyGenerator:
+    def __call__(self, prompt, **kwargs):
+        # Simple fallback response for testing
+        if "kai" in prompt.lower():
+            return [{"generated_text": prompt + " Hey! What's up?"}]
+        else:
+            return [{"generated_text": prompt + " Hello, I'm here to listen."}]
+
+def _load_llm():
+    # Allows for 4-bit quantization through BitsAndBytesConfig
+    quant_cfg = BitsAndBytesConfig(load_in_4bit=True, bnb_4bit_compute_dtype=torch.float16)
+    return AutoModelForCausalLM.from_pretrained(
         MODEL_NAME,
         device_map="auto",
         quantization_config=quant_cfg,
         token=HF_TOKEN,
     )
 
-    _generator = pipeline(
-        "text-generation",
-        model=_model,
-        tokenizer=_tokenizer,
-        torch_dtype=torch.float16,
+# Shared, lazily loaded model handles; anything else in the process asks the registry too
+model_registry.register("tokenizer", lambda: AutoTokenizer.from_pretrained(MODEL_NAME, token=HF_TOKEN))
+model_registry.register("llm", _load_llm)
+model_registry.register("vader", SentimentIntensityAnalyzer)
+
+def _load_backend() -> GenerationBackend:
+    if INFERENCE_BACKEND == "llamacpp":
+        print(f"[STARTUP] Using llama.cpp server at {LLAMACPP_URL}")
+        return LlamaCppBackend(
+            LLAMACPP_URL, max_connections=LLAMACPP_PARALLEL, ready_timeout=LLAMACPP_READY_TIMEOUT_S
+        )
+
+    print(f"[STARTUP] Loading model {MODEL_NAME}...")
+    try:
+        tokenizer = model_registry.get("tokenizer")
+        model = model_registry.get("llm")
+        print(f"[STARTUP] Model loaded successfully!")
+        return TransformersBackend(model, tokenizer, session_cache_bytes=SESSION_KV_CACHE_MB * 1024 * 1024)
+    except Exception as e:
+        print(f"[ERROR] Failed to load model: {e}")
+        if not ALLOW_DUMMY_BACKEND:
+            raise
+        print("[FALLBACK] Creating dummy generator for testing (ALLOW_DUMMY_BACKEND=1)...")
+        return PipelineBackend(DummyGenerator(), name="dummy")
+
+# Loaded by the startup warm-start task, never at import time, so reloads,
+# test collection and health probes don't wait on the weights
+inference_backend: Optional[GenerationBackend] = None
+
+# Readiness flips only after the model is resident and a warmup turn ran
+model_state = {"ready": False, "phase": "not_started", "error": None, "load_seconds": None,
+               # Post-readiness vector maintenance; its failures never touch the model phase
+               "rebuild": {"phase": "not_started", "error": None}}
+
+WARMUP_PROMPT = "User: hi\nKai:"
+
+# ---------------------------------------------------------------------------
+# Inference worker - keeps generation off the event loop
+# ---------------------------------------------------------------------------
+def _generate_batch(jobs):
+    return inference_backend.generate_batch(jobs)
+
+if INFERENCE_BACKEND == "llamacpp":
+    # The server batches continuously across its slots, so each turn goes out
+    # on its own as soon as it arrives and returns the moment it finishes;
+    # batching here would hold every turn until the slowest one in its batch
+    inference_worker = InferenceWorker(
+        _generate_batch,
+        num_threads=LLAMACPP_PARALLEL,
+        max_queue=INFERENCE_QUEUE_SIZE,
+        max_batch_size=1,
+    )
+else:
+    inference_worker = InferenceWorker(
+        _generate_batch,
+        num_threads=INFERENCE_THREADS,
+        max_queue=INFERENCE_QUEUE_SIZE,
+        max_batch_size=INFERENCE_MAX_BATCH,
+        batch_window_ms=INFERENCE_BATCH_WINDOW_MS,
     )
-    print(f"[STARTUP] Model loaded successfully!")
-except Exception as e:
-    print(f"[ERROR] Failed to load model: {e}")
-    print("[FALLBACK] Creating dummy generator for testing...")
-    
-    class DummyGenerator:
-        def __call__(self, prompt, **kwargs):
-            # Simple fallback response for testing
-            if "kai" in prompt.lower():
-                return [{"generated_text": prompt + " Hey! What's up?"}]
-            else:
-                return [{"generated_text": prompt + " Hello, I'm here to listen."}]
-    
-    _generator = DummyGenerator()
-    _tokenizer = None
 
 # ---------------------------------------------------------------------------
 # WebSocket Connection Manager
@@ -392,20 +570,159 @@ class ChatRequest(BaseModel):
 # Helper - build prompt with persona history injection
 # ---------------------------------------------------------------------------
 
-def _assemble_prompt(builder: Callable[[str, str], str], user_msg: str, history: list[dict]) -> str:
-    """Format recent messages and delegate to builder - CLEAN and SIMPLE."""
+def _assemble_prompt(builder: Callable[[str, str], str], user_msg: str, history: list[dict], turn_context: str = "") -> str:
+    """Format recent messages and delegate to builder - CLEAN and SIMPLE.
+
+    `turn_context` (memories, emotional state) goes after the history so the
+    persona preamble and history stay a stable prefix for the KV caches.
+    """
     
     # Build history block
     history_block = "".join(
         f"User: {m['message']}\n" if m["speaker"] == "user" else f"{m['speaker'].capitalize()}: {m['message']}\n"
         for m in history
     )
+    if turn_context:
+        history_block += f"\n{turn_context}\n"
     
     # Just build the prompt directly - let the persona examples handle the context
     prompt = builder(user_message=user_msg, history_block=history_block.strip())
     
     return prompt
 
+def _turn_context(emotional_context: str, contextual_memories: list[dict]) -> str:
+    """Per-turn context block: relevant past interactions, then the emotional read."""
+    parts = []
+    if contextual_memories:
+        parts.append("Relevant Past Interactions:\n" + "".join(
+            f"• {memory['content'][:100]}...\n" for memory in contextual_memories
+        ).rstrip())
+    if emotional_context:
+        parts.append(f"Emotional Context: {emotional_context}")
+    return "\n\n".join(parts)
+
+# ---------------------------------------------------------------------------
+# Reply extraction - shared by streamed deltas and the final message
+# ---------------------------------------------------------------------------
+# The model continuing the conversation past its own turn; generation stops here too
+CONVERSATION_MARKERS = ["User:", "You:", "\nUser", "\nYou"]
+# A new speaker line cuts the reply as well, but only after it has started
+_SPEAKER_MARKERS = CONVERSATION_MARKERS + ["\nKai:", "\nEden:"]
+_LEADING_SPEAKER = re.compile(r"^(Kai|Eden|User|You):\s*", re.IGNORECASE)
+
+class ReplyFilter:
+    """Turns raw completion text into the reply the client sees, incrementally.
+
+    Strips a leading "Kai:"/"Eden:", ends the reply at the first
+    conversation marker and collapses whitespace. Text that could still
+    become a marker is held back, so every delta `feed()` returns is final;
+    `finish()` releases the rest, after which `reply` is the deltas joined.
+    """
+
+    def __init__(self) -> None:
+        self.raw = ""
+        self.sent = ""
+        self.stopped = False    # a marker was seen; later text is dropped
+
+    def feed(self, delta: str) -> str:
+        if self.stopped:
+            return ""
+        self.raw += delta
+        return self._advance(self._clean(final=False))
+
+    def finish(self) -> str:
+        return self._advance(self._clean(final=True))
+
+    @property
+    def reply(self) -> str:
+        return self.sent
+
+    def _advance(self, cleaned: str) -> str:
+        delta = cleaned[len(self.sent):]
+        self.sent = cleaned
+        return delta
+
+    def _clean(self, final: bool) -> str:
+        text = self.raw.lstrip()
+        if not final and any(
+            len(text) < len(label) and label.lower().startswith(text.lower())
+            for label in ("Kai:", "Eden:", "User:", "You:")
+        ):
+            return self.sent        # could still be a leading speaker label
+        text = _LEADING_SPEAKER.sub("", text)
+        cuts = [i for i in (text.find(m) for m in _SPEAKER_MARKERS) if i >= 0]
+        if cuts:
+            text = text[: min(cuts)]
+            self.stopped = final = True
+        elif not final:
+            # Hold back a tail that may still grow into a marker
+            held = [k for m in _SPEAKER_MARKERS for k in range(1, len(m)) if text.endswith(m[:k])]
+            text = text[: len(text) - max(held, default=0)]
+        text = re.sub(r"\s+", " ", text).lstrip()
+        # Trailing whitespace is only sent once more text follows it
+        return text.rstrip() if final else text[: len(text.rstrip())]
+
+async def _send_delta(websocket: WebSocket, delta: str, persona: str) -> None:
+    delta_response = {
+        "type": "delta",
+        "content": delta,
+        "persona": persona
+    }
+    await websocket.send_text(json.dumps(delta_response))
+
+# ---------------------------------------------------------------------------
+# Pre-generation stages
+# ---------------------------------------------------------------------------
+# Per-stage budgets; a stage that overruns (or fails) degrades to its default
+# instead of holding up the turn
+STAGE_TIMEOUTS_MS = {
+    "emotion": float(os.getenv("STAGE_EMOTION_MS", "200")),
+    "sentiment": float(os.getenv("STAGE_SENTIMENT_MS", "200")),
+    "affect": float(os.getenv("STAGE_AFFECT_MS", "200")),
+    "history": float(os.getenv("STAGE_HISTORY_MS", "500")),
+    "retrieval": float(os.getenv("STAGE_RETRIEVAL_MS", "750")),   # embedding + vector query
+}
+
+async def _run_stage(name: str, work: Awaitable, default, timings: dict):
+    started = perf_counter()
+    try:
+        return await asyncio.wait_for(work, STAGE_TIMEOUTS_MS[name] / 1000.0)
+    except asyncio.TimeoutError:
+        print(f"[Stages] '{name}' exceeded {STAGE_TIMEOUTS_MS[name]:.0f}ms; using default")
+        return default
+    except Exception as e:
+        print(f"[Stages] '{name}' failed ({e}); using default")
+        return default
+    finally:
+        timings[name] = round((perf_counter() - started) * 1000.0, 1)
+
+def _update_affect(user_msg: str, session_id: str, persona_key: str) -> dict:
+    affect.update(user_msg, session_id=session_id, persona=persona_key)
+    return affect.get_vector(session_id=session_id, persona=persona_key)
+
+def _sentiment(user_msg: str) -> dict:
+    return model_registry.get("vader").polarity_scores(user_msg)
+
+async def _pre_generation(user_msg: str, session_id: str, persona_key: str, turn):
+    """Run the independent pre-generation stages at once.
+
+    Returns (emotion scores, VADER scores, affect vector, history,
+    contextual memories); the turn waits about as long as the slowest
+    stage rather than the sum of all of them. Retrieval fills `turn` with
+    the message embedding that the save later reuses.
+    """
+    timings: dict = {}
+    started = perf_counter()
+    results = await asyncio.gather(
+        _run_stage("emotion", asyncio.to_thread(get_emotion_weights, user_msg), {}, timings),
+        _run_stage("sentiment", asyncio.to_thread(_sentiment, user_msg), {"compound": 0.0}, timings),
+        _run_stage("affect", asyncio.to_thread(_update_affect, user_msg, session_id, persona_key), {}, timings),
+        _run_stage("history", memory_store.aget_recent(limit=12, session_id=session_id), [], timings),
+        _run_stage("retrieval", vector_store.aget_contextual_memory(user_msg, session_id, limit=3, turn=turn), [], timings),
+    )
+    print(f"[DEBUG] Pre-generation took {(perf_counter() - started) * 1000.0:.1f}ms; stages (ms): {timings}")
+    return results
+
 # ---------------------------------------------------------------------------
 # WebSocket endpoint for real-time chat
 # ---------------------------------------------------------------------------
@@ -422,6 +739,7 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
             data = await websocket.receive_json()
             user_input = data.get("message", "").strip()
             persona = data.get("persona", "eden").lower()
+            stream_reply = bool(data.get("stream", False))
 
             if not user_input:
                 continue
@@ -458,6 +776,17 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
                 await websocket.send_text(json.dumps(error_response))
                 continue
 
+            if not model_state["ready"]:
+                error_response = {
+                    "type": "error",
+                    "content": f"{persona.capitalize()} is still waking up. Please try again in a moment.",
+                    "persona": persona
+                }
+                await websocket.send_text(json.dumps(error_response))
+                continue
+
+            # Preambles are registered and prefilled once in warm_start; doing it
+            # here would take the prefix-cache lock on the event loop
             build_prompt: Callable[[str, str], str] = cfg["builder"]
             speaker: str = cfg["speaker"]
             tone_default: str = cfg["default_tone"]
@@ -474,27 +803,11 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
                 await websocket.send_text(json.dumps(error_response))
                 continue
 
-            # Emotional analyzer
-            current_emotion_scores = get_emotion_weights(user_msg)
-            current_analyzer = SentimentIntensityAnalyzer()
-            current_sentiment = current_analyzer.polarity_scores(user_msg)
-
-            # Update affect state
-            affect.update(user_msg, session_id=session_id, persona=persona_key)
-            trust_score = affect.get_vector(session_id=session_id, persona=persona_key).get("trust", 0)
-            
-            # Get current message sentiment to prioritize fresh emotional context
-            affect_vector = affect.get_vector(session_id=session_id, persona=persona_key)
-            current_valence = current_sentiment['compound']
-            
-            print(f"[DEBUG] Current message sentiment: {current_valence:.2f}")
-            print(f"[DEBUG] Accumulated affect valence: {affect_vector.get('valence', 0):.2f}")
-            
-            emotion_tags = [f"emotion:{e}:{s}" for e, s in current_emotion_scores.items()]
-
             # Safety / abuse filters
             if is_sexualized_prompt(user_input):
-                count = memory_store.count_tag("flag:sexualized", session_id)
+                # Only the affect update matters for a deflected turn
+                await _run_stage("affect", asyncio.to_thread(_update_affect, user_msg, session_id, persona_key), {}, {})
+                count = await memory_store.acount_tag("flag:sexualized", session_id)
                 if count >= 2:
                     reply = "This is not the space for that. Continued misuse may result in a locked session."
                     reply_tone = "firm"
@@ -506,8 +819,8 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
                     )
                     reply_tone = "calm"
 
-                memory_store.save("user", user_msg, "inappropriate", ["flag:sexualized"], session_id=session_id)
-                memory_store.save(speaker, reply, reply_tone, ["response", "deflected"], session_id=session_id)
+                await memory_store.asave("user", user_msg, "inappropriate", ["flag:sexualized"], session_id=session_id)
+                await memory_store.asave(speaker, reply, reply_tone, ["response", "deflected"], session_id=session_id)
                 
                 response_data = {
                     "type": "message",
@@ -518,6 +831,19 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
                 await websocket.send_text(json.dumps(response_data))
                 continue
 
+            # Emotional analysis, affect, history and retrieval run concurrently;
+            # the message is embedded once for both retrieval and the vector save
+            turn = vector_store.begin_turn(user_msg)
+            current_emotion_scores, current_sentiment, affect_vector, history, contextual_memories = (
+                await _pre_generation(user_msg, session_id, persona_key, turn)
+            )
+            current_valence = current_sentiment['compound']
+            
+            print(f"[DEBUG] Current message sentiment: {current_valence:.2f}")
+            print(f"[DEBUG] Accumulated affect valence: {affect_vector.get('valence', 0):.2f}")
+            
+            emotion_tags = [f"emotion:{e}:{s}" for e, s in current_emotion_scores.items()]
+
             # # Update affect state
             # affect.update(user_msg, session_id=session_id, persona=persona_key)
             # trust_score = affect.get_vector(session_id=session_id, persona=persona_key).get("trust", 0)
@@ -532,93 +858,64 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
             # emotion_tags = [f"emotion:{e}:{s}" for e, s in current_emotion_scores.items()]
 
             # History Management
-            history = memory_store.get_recent(limit=12, session_id=session_id)
             recent_history = history[-6:] if len(history) > 6 else history
             is_greeting = any(word in user_msg.lower() for word in ['hi', 'hey', 'hello', 'how are you', 'what\'s up', 'good morning'])
 
+            emotional_context = vector_store.build_emotional_context(current_emotion_scores, affect_vector)
+            # Persona preamble and history first (cacheable), per-turn context last
+            turn_context = _turn_context(emotional_context, contextual_memories)
+
             if is_greeting:
                 # For greetings, use NO history
-                prompt = _assemble_prompt(build_prompt, user_msg, [])
+                final_prompt = _assemble_prompt(build_prompt, user_msg, [], turn_context)
                 print(f"[DEBUG] Greeting detected - using NO history")
             else:
                 # For non-greetings, use recent history
-                # recent_history = history[-6:] if len(history) > 6 else history
-                prompt = _assemble_prompt(build_prompt, user_msg, recent_history)
+                final_prompt = _assemble_prompt(build_prompt, user_msg, recent_history, turn_context)
                 print(f"[DEBUG] Non-greeting - using {len(recent_history)} history entries")
 
-            emotional_context = vector_store.build_emotional_context(current_emotion_scores, affect_vector)
-            contextual_memories = vector_store.get_contextual_memory(user_msg, session_id, limit=3)
-
-            #Build enhanced prompt with all context
-            enhanced_prompt = vector_store._assemble_prompt(
-                user_msg,
-                [f"{msg['speaker']}: {msg['message']}" for msg in recent_history],
-                emotional_context,
-                contextual_memories
-            )
-
-            if contextual_memories or emotional_context:
-                final_prompt = enhanced_prompt
-                print(f"[DEBUG] Using enhanced prompt with vector context")
-            else:
-                final_prompt = prompt
-                print(f"[DEBUG] Using standard prompt")
+            if turn_context:
+                print(f"[DEBUG] Added vector context after the history")
 
 
             # Language generation
+            gen_kwargs = dict(
+                session_id=session_id,
+                max_new_tokens=80,
+                temperature=temp,
+                top_p=0.85,
+                repetition_penalty=1.05,
+                do_sample=True,
+                stop=CONVERSATION_MARKERS,
+            )
             try:
-                raw = _generator(
-                    final_prompt,
-                    max_new_tokens=80,
-                    temperature=temp,
-                    top_p=0.85,
-                    repetition_penalty=1.05,
-                    do_sample=True,
-                    pad_token_id=_tokenizer.eos_token_id if _tokenizer else None,
-                )[0]["generated_text"]
-                
-                print(f"[DEBUG] Raw LLM output length: {len(raw)}")
-                print(f"[DEBUG] Original final_prompt length: {len(final_prompt)}")
-
-                # Extract only the new content after our exact prompt
-                if raw.startswith(final_prompt):
-                    new_content = raw[len(final_prompt):].strip()
-                    print(f"[DEBUG] NEW CONTENT ONLY: '{new_content}'")
+                # The worker returns only the completion, prompt already stripped
+                reply_filter = ReplyFilter()
+                if stream_reply:
+                    # Cleaned deltas as they are produced: the persona label
+                    # is stripped and the stream ends at the first
+                    # conversation marker, same as the final "message" frame
+                    async for chunk in inference_worker.stream(final_prompt, **gen_kwargs):
+                        if delta := reply_filter.feed(chunk):
+                            await _send_delta(websocket, delta, persona_key)
+                    if delta := reply_filter.finish():
+                        await _send_delta(websocket, delta, persona_key)
                 else:
-                    print(f"[DEBUG] Warning: Raw output doesn't start with prompt!")
-                    new_content = raw.replace(final_prompt, "").strip()
-                    print(f"[DEBUG] Fallback new content: '{new_content}'")
-                
-                # Extract just the persona response
-                reply = ""
-                if new_content:
-                    # Look for "Kai:" or "Eden:" at the start
-                    persona_prefix = f"{speaker.capitalize()}:"
-                    if new_content.startswith(persona_prefix):
-                        reply = new_content[len(persona_prefix):].strip()
-                    elif persona_prefix in new_content:
-                        reply = new_content.split(persona_prefix, 1)[1].strip()
-                    else:
-                        # No persona prefix found, treat the whole thing as the response
-                        reply = new_content
-                    
-                    # Stop at any conversation markers
-                    for marker in ["User:", "You:", "\nUser", "\nYou"]:
-                        if marker in reply:
-                            reply = reply.split(marker)[0].strip()
-                            break
-                
-                print(f"[DEBUG] Extracted reply: '{reply}'")
-                
-                # Basic cleanup
-                if reply:
-                    reply = reply.replace('\n', ' ').strip()
-                    reply = re.sub(r'\s+', ' ', reply)
-                    # Remove any leftover conversation markers
-                    reply = re.sub(r'^(Kai|Eden|User|You):\s*', '', reply, flags=re.IGNORECASE)
+                    reply_filter.feed(await inference_worker.generate(final_prompt, **gen_kwargs))
+                    reply_filter.finish()
 
+                print(f"[DEBUG] NEW CONTENT ONLY: '{reply_filter.raw.strip()}'")
+                reply = reply_filter.reply
                 print(f"[DEBUG] Final cleaned reply: '{reply}'")
 
+            except InferenceQueueFull:
+                error_response = {
+                    "type": "error",
+                    "content": "Server is busy. Please try again in a moment.",
+                    "persona": persona
+                }
+                await websocket.send_text(json.dumps(error_response))
+                continue
             except Exception as exc:
                 print(f"[ERROR] Generation failed: {str(exc)}")
                 error_response = {
@@ -642,13 +939,13 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
             print(f"[DEBUG] SUCCESS - Final reply: '{reply}'")
 
             try:
-                vector_store.save_interaction(user_msg, reply, current_emotion_scores, session_id)
+                await vector_store.asave_interaction(user_msg, reply, current_emotion_scores, session_id, turn=turn)
             except Exception as e:
                 print(f"[WARNING] Failed to save to vector store")
 
             # Persist conversation
-            memory_store.save("user", user_msg, "unknown", ["input", *emotion_tags], session_id=session_id)
-            memory_store.save(speaker, reply, tone_default, ["response"], session_id=session_id)
+            await memory_store.asave("user", user_msg, "unknown", ["input", *emotion_tags], session_id=session_id)
+            await memory_store.asave(speaker, reply, tone_default, ["response"], session_id=session_id)
 
             logger = structlog.get_logger()
 
@@ -683,11 +980,24 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
     except Exception as e:
         print(f"WebSocket error: {str(e)}")
         manager.disconnect(user_id)
+    finally:
+        if inference_backend is not None:
+            inference_backend.drop_session(session_id)
 
 # ---------------------------------------------------------------------------
 # Monitoring/Logging
 # ---------------------------------------------------------------------------
-
+@app.get("/inference/stats")
+async def inference_stats():
+    """Throughput and batch occupancy of the generation worker, plus the embedding pipeline's."""
+    backend_stats = inference_backend.stats() if inference_backend is not None else {}
+    return {
+        **inference_worker.stats(),
+        **backend_stats,
+        # Micro-batch sizes and embedding cache hits/misses
+        "embeddings": embedding_pipeline.stats(),
+        "models": model_registry.stats(),
+    }
 
 
 # ---------------------------------------------------------------------------
@@ -735,7 +1045,7 @@ async def debug_chat_state(session_id: str):
     """Debug endpoint to see chat history and prompt generation"""
     try:
         # Get recent history
-        history = memory_store.get_recent(limit=12, session_id=session_id)
+        history = await memory_store.aget_recent(limit=12, session_id=session_id)
         
         # Get affect state for both personas
         kai_affect = affect.get_vector(session_id=session_id, persona="kai")
@@ -772,9 +1082,19 @@ async def health_check():
         "personas": list(PERSONAS.keys()),
         "model": MODEL_NAME,
         "active_connections": len(manager.active_connections),
-        "model_loaded": _tokenizer is not None
+        "backend": inference_backend.name if inference_backend is not None else None,
+        "model_loaded": inference_backend is not None and inference_backend.name != "dummy",
+        "ready": model_state["ready"],
+        "vector_rebuild": model_state["rebuild"],
+        "inference": inference_worker.stats(),
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the model is loaded and warmed."""
+    code = status.HTTP_200_OK if model_state["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(status_code=code, content=model_state)
+
 # ---------------------------------------------------------------------------
 # Misc endpoints
 # ---------------------------------------------------------------------------
@@ -784,21 +1104,27 @@ def root():
 
 @app.get("/memory")
 async def get_memory(session: str = DEFAULT_SESSION):
-    return memory_store.get_recent(10, session_id=session)
+    return await memory_store.aget_recent(10, session_id=session)
+
+@app.get("/memory/emotions")
+async def get_memory_emotions(session: str = DEFAULT_SESSION):
+    """Per-emotion counts, mean scores, last-seen times and top moments for a session."""
+    return await vector_store.aget_emotion_summary(session)
 
 @app.get("/memory/reset")
 async def reset_memory(session: str = DEFAULT_SESSION):
-    memory_store.clear(session)
+    # clear waits for any group commit in progress; keep that off the event loop
+    await memory_store.aclear(session)
     return {"status": f"Memory for session '{session}' cleared."}
 
 @app.get("/memory/reset_all")
 async def reset_all_memory():
-    memory_store.clear_all()
+    await memory_store.aclear_all()
     return {"status": "All memory cleared."}
 
 @app.get("/sessions", response_model=List[str])
 def list_sessions():
-    return list(memory_store.sessions.keys())
+    return memory_store.list_sessions()
 
 @app.delete("/sessions/{session_id}")
 def delete_session(session_id: str):
@@ -814,17 +1140,64 @@ def delete_all_sessions():
 async def clear_session(request: Request):
     data = await request.json()
     session_id = data.get("session_id", DEFAULT_SESSION)
-    memory_store.clear(session_id)
+    await memory_store.aclear(session_id)
     return {"status": f"Session '{session_id}' cleared."}
 
 # ---------------------------------------------------------------------------
 # Scheduler hooks
 # ---------------------------------------------------------------------------
 scheduler_thread = None
+warm_start_task = None
+
+async def warm_start():
+    """Load the model off the event loop, prefill persona prefixes, run one warmup turn."""
+    global inference_backend
+    loop = asyncio.get_event_loop()
+    started = time()
+    try:
+        model_state["phase"] = "loading"
+        inference_backend = await loop.run_in_executor(None, _load_backend)
+        await loop.run_in_executor(None, model_registry.get, "vader")
+        # So the first chat turn doesn't pay for the embedding model either
+        await loop.run_in_executor(None, embedding_pipeline.load)
+
+        model_state["phase"] = "warming"
+        for name, cfg in PERSONAS.items():
+            inference_backend.register_prefix(name, persona_prefix(cfg["builder"]))
+        await loop.run_in_executor(None, inference_backend.warm)
+        inference_worker.start()
+        await inference_worker.generate(WARMUP_PROMPT, max_new_tokens=8, temperature=0.7, top_p=0.85)
+
+        model_state.update(ready=True, phase="ready", load_seconds=round(time() - started, 1))
+        print(f"[FastAPI] Model ready in {model_state['load_seconds']}s.")
+        model_registry.report()
+    except Exception as e:
+        model_state.update(phase="failed", error=str(e))
+        print(f"[FastAPI] Warm start failed: {e}")
+        return
+
+    # After readiness, so chats are served while history is re-embedded
+    await _maintain_vectors(loop)
+
+async def _maintain_vectors(loop) -> None:
+    """Re-embed history and migrate metadata; reported under model_state["rebuild"]."""
+    rebuild = model_state["rebuild"]
+    try:
+        rebuild["phase"] = "running"
+        if vector_store.needs_rebuild() and (VECTOR_REBUILD_IF_EMPTY or vector_store.count() > 0):
+            await loop.run_in_executor(None, vector_store.rebuild_from, memory_store)
+        if VECTOR_MIGRATE_EMOTIONS:
+            await loop.run_in_executor(None, vector_store.migrate_emotion_metadata)
+        rebuild["phase"] = "done"
+    except Exception as e:
+        rebuild.update(phase="failed", error=str(e))
+        print(f"[FastAPI] Vector store maintenance failed: {e}")
 
 @app.on_event("startup")
 async def startup_event():
-    global scheduler_thread
+    global scheduler_thread, warm_start_task
+    # Runs in the background so /health answers while the weights load
+    warm_start_task = asyncio.create_task(warm_start())
     try:
         scheduler_thread = Thread(target=run_scheduler, daemon=True)
         scheduler_thread.start()
@@ -834,6 +1207,13 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    if warm_start_task is not None and not warm_start_task.done():
+        warm_start_task.cancel()
+    inference_worker.stop()
+    if inference_backend is not None:
+        inference_backend.close()
+    memory_store.close()
+    vector_store.close()
     try:
         stop_scheduler()
         print("[FastAPI] Scheduler stopped.")
@@ -0,0 +1,223 @@
+# backends.py
+"""Interchangeable text-generation backends for the inference worker.
+
+The worker only needs `generate_batch(jobs)`; everything model specific
+lives behind this interface so the chat pipeline is unchanged whether
+turns run on the in-process transformers model or on a llama.cpp server.
+"""
+
+from __future__ import annotations
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic, sleep
+from typing import Callable
+
+try:
+    from .worker import GenerationJob, GenerationResult
+    from .batching import generate_batch
+    from .kv_cache import PrefixCache, SessionCache
+except ImportError:
+    from worker import GenerationJob, GenerationResult
+    from batching import generate_batch
+    from kv_cache import PrefixCache, SessionCache
+
+
+class GenerationBackend:
+    name = "base"
+
+    def generate_batch(self, jobs: list[GenerationJob]) -> list[GenerationResult]:
+        raise NotImplementedError
+
+    # Optional hooks; backends without KV reuse simply ignore them
+    def register_prefix(self, name: str, prefix_text: str) -> None:
+        pass
+
+    def warm(self) -> None:
+        pass
+
+    def drop_session(self, session_id: str) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+    def close(self) -> None:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# In-process transformers model
+# ---------------------------------------------------------------------------
+class TransformersBackend(GenerationBackend):
+    name = "transformers"
+
+    def __init__(self, model, tokenizer, session_cache_bytes: int) -> None:
+        self.model = model
+        self.tokenizer = tokenizer
+        # Batched generation pads on the left so every row ends at the prompt edge
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.prefix_cache = PrefixCache(model, tokenizer)
+        self.session_cache = SessionCache(session_cache_bytes)
+
+    def generate_batch(self, jobs: list[GenerationJob]) -> list[GenerationResult]:
+        return generate_batch(
+            self.model,
+            self.tokenizer,
+            jobs,
+            prefix_cache=self.prefix_cache,
+            session_cache=self.session_cache,
+        )
+
+    def register_prefix(self, name: str, prefix_text: str) -> None:
+        self.prefix_cache.register(name, prefix_text)
+
+    def warm(self) -> None:
+        self.prefix_cache.warm()
+
+    def drop_session(self, session_id: str) -> None:
+        self.session_cache.drop(session_id)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "prefix_cache": self.prefix_cache.stats(),
+            "session_cache": self.session_cache.stats(),
+        }
+
+
+# ---------------------------------------------------------------------------
+# Any pipeline-style callable (used for the offline dummy generator)
+# ---------------------------------------------------------------------------
+class PipelineBackend(GenerationBackend):
+    name = "pipeline"
+
+    def __init__(self, generator: Callable, name: str | None = None) -> None:
+        self.generator = generator
+        if name:
+            self.name = name
+
+    def generate_batch(self, jobs: list[GenerationJob]) -> list[GenerationResult]:
+        results = []
+        for job in jobs:
+            raw = self.generator(job.prompt, **job.kwargs)[0]["generated_text"]
+            text = raw[len(job.prompt):] if raw.startswith(job.prompt) else raw
+            if job.on_text is not None:
+                job.on_text(text)
+            results.append(GenerationResult(text=text, new_tokens=len(text.split())))
+        return results
+
+
+# ---------------------------------------------------------------------------
+# llama.cpp server (llama.cpp/tools/server) over HTTP
+# ---------------------------------------------------------------------------
+class LlamaCppBackend(GenerationBackend):
+    """Client for the llama.cpp server `/completion` endpoint.
+
+    The server batches continuously across its slots (`--parallel N
+    --cont-batching`), so drive it with one worker thread per slot and
+    `max_batch_size=1`: every turn is sent as soon as it is queued and
+    returns as soon as its own completion ends. Rows of a larger batch are
+    still sent concurrently over the pooled keep-alive connections. With
+    `cache_prompt` the server reuses the KV state of the longest matching
+    prompt prefix in the slot, which covers persona and history reuse.
+    """
+
+    name = "llama.cpp"
+
+    def __init__(
+        self, base_url: str, max_connections: int = 8, timeout: float = 120.0, ready_timeout: float = 600.0
+    ) -> None:
+        import httpx
+
+        self.base_url = base_url.rstrip("/")
+        self.ready_timeout = ready_timeout
+        self.client = httpx.Client(
+            base_url=self.base_url,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+        self._pool = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="llamacpp")
+
+    def generate_batch(self, jobs: list[GenerationJob]) -> list[GenerationResult]:
+        if len(jobs) == 1:
+            return [self._complete(jobs[0])]
+        futures = [self._pool.submit(self._complete, job) for job in jobs]
+        return [f.result() for f in futures]
+
+    def warm(self) -> None:
+        """Wait, with backoff, until the server has loaded its model.
+
+        `/health` answers 503 (or the connection is refused) while the GGUF
+        is still loading; raises if it isn't ready within `ready_timeout`.
+        """
+        import httpx
+
+        deadline = monotonic() + self.ready_timeout
+        delay = 0.5
+        while True:
+            try:
+                response = self.client.get("/health")
+                if response.status_code == 200:
+                    return
+                reason = f"HTTP {response.status_code}"
+            except httpx.TransportError as e:
+                reason = str(e) or type(e).__name__
+            if monotonic() + delay > deadline:
+                raise RuntimeError(
+                    f"llama.cpp server at {self.base_url} not ready after {self.ready_timeout:.0f}s ({reason})"
+                )
+            print(f"[llama.cpp] Server not ready ({reason}); retrying in {delay:.1f}s")
+            sleep(delay)
+            delay = min(2 * delay, 10.0)
+
+    def _payload(self, job: GenerationJob) -> dict:
+        kw = job.kwargs
+        return {
+            "prompt": job.prompt,
+            "n_predict": kw.get("max_new_tokens", 80),
+            "temperature": kw.get("temperature", 0.8),
+            "top_p": kw.get("top_p", 0.95),
+            "repeat_penalty": kw.get("repetition_penalty", 1.0),
+            "cache_prompt": True,
+            "stop": list(kw.get("stop", ())),
+            "stream": job.on_text is not None,
+        }
+
+    def _complete(self, job: GenerationJob) -> GenerationResult:
+        payload = self._payload(job)
+        if not payload["stream"]:
+            response = self.client.post("/completion", json=payload)
+            response.raise_for_status()
+            data = response.json()
+            return GenerationResult(text=data["content"], new_tokens=data.get("tokens_predicted", 0))
+
+        # Server-sent events: one JSON chunk per token, the last has "stop": true
+        parts: list[str] = []
+        new_tokens = 0
+        with self.client.stream("POST", "/completion", json=payload) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line.startswith("data: "):
+                    continue
+                chunk = json.loads(line[len("data: "):])
+                text = chunk.get("content", "")
+                if text:
+                    parts.append(text)
+                    job.on_text(text)
+                if chunk.get("stop"):
+                    new_tokens = chunk.get("tokens_predicted", len(parts))
+                    break
+        return GenerationResult(text="".join(parts), new_tokens=new_tokens)
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "url": self.base_url}
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+        self.client.close()
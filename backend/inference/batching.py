@@ -0,0 +1,180 @@
+# batching.py
+"""Padded-batch generation for the transformers model.
+
+The stock text-generation pipeline applies one temperature to the whole
+batch, but every persona samples at its own temperature. Here the batch
+runs through `model.generate` with neutral sampling settings and a
+per-row warper applies each turn's temperature and top-p instead.
+
+A turn that runs alone resumes from the longest reusable KV state: the
+session's cache from its previous turn or, failing that, the persona
+prefix cache. Padded rows would shift the cached positions, so larger
+batches always prefill in full.
+
+Streaming turns get their text through `BatchTextStreamer`, which routes
+each row's new tokens to the callback of the turn that owns that row.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+import torch
+from transformers import LogitsProcessor, LogitsProcessorList
+from transformers.generation.streamers import BaseStreamer
+
+try:
+    from .worker import GenerationJob, GenerationResult
+    from .kv_cache import PrefixCache, SessionCache
+except ImportError:
+    from worker import GenerationJob, GenerationResult
+    from kv_cache import PrefixCache, SessionCache
+
+
+class PerRowSamplingWarper(LogitsProcessor):
+    """Temperature + nucleus filtering with one setting per batch row."""
+
+    def __init__(self, temperatures: torch.Tensor, top_p: torch.Tensor) -> None:
+        self.temperatures = temperatures
+        self.top_p = top_p
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        scores = scores / self.temperatures[:, None]
+
+        sorted_logits, sorted_idx = torch.sort(scores, descending=False)
+        cumulative = sorted_logits.softmax(dim=-1).cumsum(dim=-1)
+        remove = cumulative <= (1 - self.top_p[:, None])
+        remove[..., -1:] = False   # always keep the most likely token
+        remove = remove.scatter(1, sorted_idx, remove)
+        return scores.masked_fill(remove, -float("inf"))
+
+
+class BatchTextStreamer(BaseStreamer):
+    """Incrementally decodes every batch row and emits the new text.
+
+    The whole row is re-decoded each step (rows are at most a few dozen
+    tokens) so multi-token characters and SentencePiece spacing come out
+    exactly as in the final decode; an incomplete UTF-8 tail is held back.
+    """
+
+    def __init__(self, tokenizer, jobs: list[GenerationJob]) -> None:
+        self.tokenizer = tokenizer
+        self.callbacks = [job.on_text for job in jobs]
+        self.limits = [job.kwargs.get("max_new_tokens", 80) for job in jobs]
+        self.tokens: list[list[int]] = [[] for _ in jobs]
+        self.sent = [0] * len(jobs)
+        self.finished = [cb is None for cb in self.callbacks]
+        self._prompt_seen = False
+
+    def put(self, value: torch.Tensor) -> None:
+        # generate() first pushes the prompt ids, then one token per row per step
+        if not self._prompt_seen:
+            self._prompt_seen = True
+            return
+        for i, token in enumerate(value.tolist()):
+            if self.finished[i]:
+                continue
+            if token == self.tokenizer.eos_token_id:
+                self.finished[i] = True
+                continue
+            self.tokens[i].append(token)
+            if len(self.tokens[i]) >= self.limits[i]:
+                self.finished[i] = True
+            self._emit(i, final=self.finished[i])
+
+    def end(self) -> None:
+        for i, cb in enumerate(self.callbacks):
+            if cb is not None:
+                self._emit(i, final=True)
+
+    def _emit(self, i: int, final: bool) -> None:
+        text = self.tokenizer.decode(self.tokens[i], skip_special_tokens=True)
+        if not final and text.endswith("\ufffd"):
+            return
+        delta = text[self.sent[i]:]
+        if delta:
+            self.sent[i] = len(text)
+            self.callbacks[i](delta)
+
+
+def _resume_state(
+    input_ids: torch.Tensor,
+    job: GenerationJob,
+    prefix_cache: Optional[PrefixCache],
+    session_cache: Optional[SessionCache],
+):
+    """Pick the longest cached KV state that `input_ids` extends, if any."""
+    reused, past_key_values = 0, None
+    if session_cache is not None and job.session_id:
+        hit = session_cache.lookup(job.session_id, input_ids)
+        if hit is not None:
+            reused, past_key_values = hit
+    if prefix_cache is not None:
+        hit = prefix_cache.lookup(input_ids, min_length=reused)
+        if hit is not None:
+            reused, past_key_values = hit
+    return past_key_values
+
+
+def generate_batch(
+    model,
+    tokenizer,
+    jobs: list[GenerationJob],
+    prefix_cache: Optional[PrefixCache] = None,
+    session_cache: Optional[SessionCache] = None,
+) -> list[GenerationResult]:
+    """Run all jobs as one left-padded batch and return their completions."""
+    device = model.device
+    enc = tokenizer([job.prompt for job in jobs], return_tensors="pt", padding=True).to(device)
+
+    past_key_values = None
+    if len(jobs) == 1:
+        past_key_values = _resume_state(enc["input_ids"], jobs[0], prefix_cache, session_cache)
+
+    temperatures = torch.tensor(
+        [max(job.kwargs.get("temperature", 1.0), 1e-4) for job in jobs],
+        dtype=torch.float32, device=device,
+    )
+    top_p = torch.tensor(
+        [job.kwargs.get("top_p", 1.0) for job in jobs],
+        dtype=torch.float32, device=device,
+    )
+    max_new = [job.kwargs.get("max_new_tokens", 80) for job in jobs]
+    streamer = BatchTextStreamer(tokenizer, jobs) if any(job.on_text for job in jobs) else None
+    # Every persona shares the same stop strings; a row that hits one finishes early
+    stop_strings = sorted({stop for job in jobs for stop in job.kwargs.get("stop", ())})
+
+    with torch.no_grad():
+        output = model.generate(
+            **enc,
+            do_sample=True,
+            temperature=1.0,
+            top_p=1.0,
+            max_new_tokens=max(max_new),
+            # Every persona shares the same penalty; take it from the first turn
+            repetition_penalty=jobs[0].kwargs.get("repetition_penalty", 1.0),
+            logits_processor=LogitsProcessorList([PerRowSamplingWarper(temperatures, top_p)]),
+            pad_token_id=tokenizer.pad_token_id,
+            streamer=streamer,
+            stop_strings=stop_strings or None,
+            tokenizer=tokenizer if stop_strings else None,
+            past_key_values=past_key_values,
+            return_dict_in_generate=True,
+        )
+
+    if len(jobs) == 1 and session_cache is not None and jobs[0].session_id:
+        cache = output.past_key_values
+        session_cache.store(jobs[0].session_id, output.sequences[0, : cache.get_seq_length()], cache)
+
+    new_tokens = output.sequences[:, enc["input_ids"].shape[1]:]
+    results = []
+    for row, limit in zip(new_tokens, max_new):
+        row = row[:limit]
+        stop = (row == tokenizer.eos_token_id).nonzero()
+        if len(stop):
+            row = row[: stop[0].item()]
+        results.append(GenerationResult(
+            text=tokenizer.decode(row, skip_special_tokens=True),
+            new_tokens=len(row),
+        ))
+    return results
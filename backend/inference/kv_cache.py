@@ -0,0 +1,212 @@
+# kv_cache.py
+"""Reusable attention (KV) caches for the transformers model.
+
+Every turn of a persona starts with the same long preamble, so its
+`past_key_values` are computed once and each request resumes generation
+from a copy of that state instead of re-running prefill over it.
+
+Consecutive turns of one session share even more: preamble plus history.
+`SessionCache` keeps the state each session ended its last turn with, so
+the next turn only prefills what comes after the longest common prefix.
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import torch
+
+# Probe values used to find where a builder's static preamble ends
+_USER_PROBE = "<<kai-prefix-probe-user>>"
+_HISTORY_PROBE = "<<kai-prefix-probe-history>>"
+
+
+def persona_prefix(builder: Callable[..., str]) -> str:
+    """Return the part of the builder output that precedes any per-turn text."""
+    probe = builder(user_message=_USER_PROBE, history_block=_HISTORY_PROBE)
+    cuts = [i for i in (probe.find(_USER_PROBE), probe.find(_HISTORY_PROBE)) if i >= 0]
+    return probe[: min(cuts)] if cuts else probe
+
+
+@dataclass
+class _PrefixEntry:
+    digest: str
+    text: str
+    input_ids: Optional[torch.Tensor] = None     # 1-D, on the model device
+    past_key_values: object = None
+
+
+class PrefixCache:
+    def __init__(self, model, tokenizer) -> None:
+        self.model = model
+        self.tokenizer = tokenizer
+        self._entries: dict[str, _PrefixEntry] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ----------------------------------------------------
+    # registration / invalidation
+    # ----------------------------------------------------
+    def register(self, name: str, prefix_text: str) -> None:
+        """Record the current prefix for `name`; drops the cache if it changed."""
+        digest = hashlib.sha1(prefix_text.encode("utf-8")).hexdigest()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry.digest == digest:
+                return
+            if entry is not None:
+                print(f"[PrefixCache] Prefix for '{name}' changed; invalidating.")
+            self._entries[name] = _PrefixEntry(digest=digest, text=prefix_text)
+
+    def warm(self) -> None:
+        """Compute the KV state of every registered prefix that lacks one."""
+        with self._lock:
+            for name, entry in self._entries.items():
+                if entry.input_ids is None:
+                    self._compute(entry)
+                    print(f"[PrefixCache] Cached {len(entry.input_ids)} prefix tokens for '{name}'.")
+
+    # ----------------------------------------------------
+    # lookup
+    # ----------------------------------------------------
+    def lookup(self, input_ids: torch.Tensor, min_length: int = 0) -> Optional[tuple[int, object]]:
+        """Find a cached prefix of `input_ids` (shape [1, n]) longer than `min_length`.
+
+        Returns the prefix length and a private copy of its cache, which
+        generate() is free to extend in place.
+        """
+        ids = input_ids[0]
+        with self._lock:
+            for entry in self._entries.values():
+                if entry.input_ids is None:
+                    self._compute(entry)
+                n = len(entry.input_ids)
+                # At least one prompt token must remain for generate() to prefill
+                if min_length < n < len(ids) and torch.equal(ids[:n], entry.input_ids):
+                    self.hits += 1
+                    return n, copy.deepcopy(entry.past_key_values)
+            self.misses += 1
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": {
+                    name: len(e.input_ids) if e.input_ids is not None else None
+                    for name, e in self._entries.items()
+                },
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    # ----------------------------------------------------
+    # internals
+    # ----------------------------------------------------
+    def _compute(self, entry: _PrefixEntry) -> None:
+        ids = self.tokenizer(entry.text, return_tensors="pt")["input_ids"].to(self.model.device)
+        # The last token can merge with whatever text follows the prefix,
+        # so leave it out of the cached span.
+        ids = ids[:, :-1]
+        if ids.shape[1]:
+            with torch.no_grad():
+                entry.past_key_values = self.model(input_ids=ids, use_cache=True).past_key_values
+        entry.input_ids = ids[0]
+
+
+def cache_nbytes(cache) -> int:
+    """Total tensor bytes held by a DynamicCache."""
+    layers = getattr(cache, "layers", None)
+    if layers is not None:
+        return sum(
+            layer.keys.nbytes + layer.values.nbytes
+            for layer in layers
+            if getattr(layer, "keys", None) is not None
+        )
+    return sum(t.nbytes for t in (*cache.key_cache, *cache.value_cache))
+
+
+@dataclass
+class _SessionEntry:
+    token_ids: torch.Tensor     # 1-D, tokens covered by the cache
+    past_key_values: object
+    nbytes: int
+
+
+class SessionCache:
+    """LRU of per-session KV caches bounded by a total byte budget.
+
+    `lookup` hands the cache over to the caller (it is removed from the
+    LRU) because generate() extends it in place; `store` puts it back.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, _SessionEntry] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, session_id: str, input_ids: torch.Tensor) -> Optional[tuple[int, object]]:
+        """Return (reused length, cache cropped to it) or None if nothing usable."""
+        ids = input_ids[0]
+        with self._lock:
+            entry = self._entries.pop(session_id, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._bytes -= entry.nbytes
+
+        cached = entry.token_ids.to(ids.device)
+        n = min(len(cached), len(ids) - 1)
+        mismatch = (cached[:n] != ids[:n]).nonzero()
+        common = mismatch[0].item() if len(mismatch) else n
+        if common == 0:
+            # Nothing shared with the previous turn; the stale cache is dropped
+            with self._lock:
+                self.misses += 1
+            return None
+
+        entry.past_key_values.crop(common)
+        with self._lock:
+            self.hits += 1
+        return common, entry.past_key_values
+
+    def store(self, session_id: str, token_ids: torch.Tensor, past_key_values) -> None:
+        nbytes = cache_nbytes(past_key_values)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(session_id, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._entries[session_id] = _SessionEntry(token_ids.detach(), past_key_values, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def drop(self, session_id: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(session_id, None)
+            if entry is not None:
+                self._bytes -= entry.nbytes
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
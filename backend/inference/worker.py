@@ -0,0 +1,215 @@
+# worker.py
+"""Dedicated inference worker for the chat API.
+
+Generation is slow and fully synchronous, so it must never run on the
+event loop. The worker owns a bounded request queue and one or more
+generation threads; async handlers submit a prompt and await the result
+while every other socket keeps being served.
+
+Each generation thread drains the queue in batches: it blocks for the
+first pending turn, then keeps collecting for up to `batch_window_ms`
+(or until `max_batch_size` turns are waiting) and hands the whole batch
+to `generate_batch` in one call.
+
+Turns submitted with an `on_text` callback are streamed: the batch
+function calls it from the generation thread with each new piece of
+completion text, and `stream()` relays those pieces to the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import Any, AsyncIterator, Callable, Optional
+
+
+class InferenceQueueFull(Exception):
+    """Raised when the request queue is at capacity."""
+
+
+@dataclass
+class GenerationJob:
+    prompt: str
+    kwargs: dict[str, Any]
+    future: Future = field(default_factory=Future)
+    on_text: Optional[Callable[[str], None]] = None
+    session_id: Optional[str] = None
+
+
+@dataclass
+class GenerationResult:
+    text: str          # completion only, prompt stripped
+    new_tokens: int
+
+
+BatchFn = Callable[[list[GenerationJob]], list[GenerationResult]]
+
+_STOP = object()
+
+
+class InferenceWorker:
+    def __init__(
+        self,
+        generate_batch: BatchFn,
+        num_threads: int = 1,
+        max_queue: int = 32,
+        max_batch_size: int = 1,
+        batch_window_ms: float = 0.0,
+    ) -> None:
+        self.generate_batch = generate_batch
+        self.num_threads = num_threads
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_window = batch_window_ms / 1000.0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._batches = 0
+        self._batched_jobs = 0
+        self._tokens = 0
+        self._gen_seconds = 0.0
+
+    # ----------------------------------------------------
+    # lifecycle
+    # ----------------------------------------------------
+    def start(self) -> None:
+        if self._threads:
+            return
+        for i in range(self.num_threads):
+            t = threading.Thread(target=self._run, name=f"inference-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        print(
+            f"[Inference] Started {self.num_threads} generation thread(s) "
+            f"(max_batch={self.max_batch_size}, window={self.batch_window * 1000:.0f}ms)."
+        )
+
+    def stop(self, timeout: float = 5.0) -> None:
+        for _ in self._threads:
+            # Blocks only if the queue is full; the workers are draining it.
+            self._queue.put(_STOP)
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads.clear()
+
+    # ----------------------------------------------------
+    # public API
+    # ----------------------------------------------------
+    def submit(
+        self,
+        prompt: str,
+        on_text: Optional[Callable[[str], None]] = None,
+        session_id: Optional[str] = None,
+        **kwargs,
+    ) -> Future:
+        job = GenerationJob(prompt=prompt, kwargs=kwargs, on_text=on_text, session_id=session_id)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            raise InferenceQueueFull("Inference queue is full") from None
+        return job.future
+
+    async def generate(self, prompt: str, **kwargs) -> str:
+        result: GenerationResult = await asyncio.wrap_future(self.submit(prompt, **kwargs))
+        return result.text
+
+    async def stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Yield completion text deltas as the model produces them.
+
+        Joined together the deltas equal the text `generate()` would return.
+        """
+        loop = asyncio.get_running_loop()
+        deltas: asyncio.Queue = asyncio.Queue()
+
+        def on_text(delta: str) -> None:
+            loop.call_soon_threadsafe(deltas.put_nowait, delta)
+
+        future = asyncio.wrap_future(self.submit(prompt, on_text=on_text, **kwargs))
+        # Scheduled after every on_text call, so it always arrives last
+        future.add_done_callback(lambda _: deltas.put_nowait(None))
+        try:
+            while (delta := await deltas.get()) is not None:
+                yield delta
+            future.result()
+        finally:
+            future.cancel()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            avg_batch = self._batched_jobs / self._batches if self._batches else 0.0
+            return {
+                "threads": len(self._threads),
+                "queued": self._queue.qsize(),
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "failed": self._failed,
+                "max_batch_size": self.max_batch_size,
+                "batch_window_ms": self.batch_window * 1000,
+                "batches": self._batches,
+                "avg_batch_size": round(avg_batch, 2),
+                "batch_occupancy": round(avg_batch / self.max_batch_size, 3),
+                "tokens_generated": self._tokens,
+                "tokens_per_second": round(self._tokens / self._gen_seconds, 2) if self._gen_seconds else 0.0,
+            }
+
+    # ----------------------------------------------------
+    # generation loop
+    # ----------------------------------------------------
+    def _collect_batch(self) -> tuple[list[GenerationJob], bool]:
+        """Block for one job, then gather more until the window closes."""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+
+        batch = [first]
+        deadline = monotonic() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - monotonic()
+            try:
+                job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is _STOP:
+                return batch, True
+            batch.append(job)
+        return batch, False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = self._collect_batch()
+            # Skip turns whose handler went away while they were queued
+            batch = [job for job in batch if job.future.set_running_or_notify_cancel()]
+            if batch:
+                self._process(batch)
+
+    def _process(self, batch: list[GenerationJob]) -> None:
+        with self._lock:
+            self._in_flight += len(batch)
+        started = monotonic()
+        try:
+            results = self.generate_batch(batch)
+        except Exception as exc:
+            with self._lock:
+                self._failed += len(batch)
+            for job in batch:
+                job.future.set_exception(exc)
+        else:
+            elapsed = monotonic() - started
+            with self._lock:
+                self._completed += len(batch)
+                self._batches += 1
+                self._batched_jobs += len(batch)
+                self._tokens += sum(r.new_tokens for r in results)
+                self._gen_seconds += elapsed
+            for job, result in zip(batch, results):
+                job.future.set_result(result)
+        finally:
+            with self._lock:
+                self._in_flight -= len(batch)
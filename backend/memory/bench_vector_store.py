@@ -0,0 +1,101 @@
+# bench_vector_store.py
+"""Per-session retrieval latency: Chroma vs the in-process NumPy index.
+
+Fills each store with N random 384-d vectors for the session under test
+(plus the same number spread over other sessions, so Chroma's
+`where` filter has something to filter out) and times `search()`, the
+part of `get_contextual_memory` after the query is embedded.
+
+Run it from the repository root, so the stores' package imports resolve:
+
+    python -m backend.memory.bench_vector_store --sizes 100 1000 10000 --queries 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+from time import perf_counter
+
+import numpy as np
+
+try:
+    from .vector_memory_store import VectorMemoryStore
+    from .numpy_vector_store import NumpyVectorMemoryStore
+except ImportError:
+    from vector_memory_store import VectorMemoryStore
+    from numpy_vector_store import NumpyVectorMemoryStore
+
+DIM = 384
+SESSION = "bench"
+OTHER_SESSIONS = 10
+INSERT_BATCH = 1000
+
+
+class _NoEmbedding:
+    """Stands in for EmbeddingPipeline; the benchmark supplies raw vectors."""
+
+    def close(self) -> None:
+        pass
+
+
+def _fill(store: VectorMemoryStore, n: int, rng: np.random.Generator) -> None:
+    rows = [(SESSION, i) for i in range(n)] + [(f"other-{i % OTHER_SESSIONS}", i) for i in range(n)]
+    for start in range(0, len(rows), INSERT_BATCH):
+        batch = rows[start:start + INSERT_BATCH]
+        store._add(
+            ids=[f"{sid}_{i}" for sid, i in batch],
+            documents=[f"User: message {i}\nAI: reply {i}" for _, i in batch],
+            embeddings=rng.standard_normal((len(batch), DIM), dtype=np.float32).tolist(),
+            metadatas=[
+                {"session_id": sid, "emotions": "{}", "timestamp": "", "embedding_variant": store.embedding_variant}
+                for sid, _ in batch
+            ],
+        )
+
+
+def _time(store: VectorMemoryStore, queries: np.ndarray, k: int) -> list[float]:
+    store.search(queries[0].tolist(), SESSION, k)   # warm-up
+    latencies = []
+    for q in queries:
+        q = q.tolist()
+        started = perf_counter()
+        store.search(q, SESSION, k)
+        latencies.append((perf_counter() - started) * 1000.0)
+    return latencies
+
+
+def _summary(latencies: list[float]) -> str:
+    latencies = sorted(latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    return f"p50 {statistics.median(latencies):7.3f} ms   p95 {p95:7.3f} ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for n in args.sizes:
+        queries = rng.standard_normal((args.queries, DIM), dtype=np.float32)
+
+        chroma = VectorMemoryStore(embedding_pipeline=_NoEmbedding(), path=None)
+        # The in-memory client is shared per process; start every size from an empty collection
+        chroma.client.delete_collection("conversations")
+        chroma.collection = chroma.client.get_or_create_collection(
+            name="conversations", metadata={"hnsw:space": "cosine"}
+        )
+        numpy_store = NumpyVectorMemoryStore(embedding_pipeline=_NoEmbedding())
+
+        print(f"\n{n} vectors per session ({2 * n} total)")
+        for name, store in (("chroma", chroma), ("numpy", numpy_store)):
+            _fill(store, n, rng)
+            print(f"  {name:<7} {_summary(_time(store, queries, args.k))}")
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
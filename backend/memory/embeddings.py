@@ -1,10 +1,409 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Optional
 from sentence_transformers import SentenceTransformer
 import chromadb
+import hashlib
+import json
+import numpy as np
+import queue
+import threading
+import time
+
+try:
+    from backend.model_registry import registry
+except ImportError:
+    from model_registry import registry
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+MAX_BATCH_SIZE = 32     # texts per model.encode call
+MAX_WAIT_MS = 5.0       # how long the first queued text waits for company
+CACHE_ENTRIES = 10000   # embedding cache bounds (MiniLM: 1.5 KB per vector)
+CACHE_MB = 64
+
+# What a stored interaction's vector embeds; queries always embed the user message alone
+EMBEDDING_VARIANTS = (
+    "user",             # the user message, exactly the query vector: storing a turn costs no encode
+    "user+reply",       # normalized sum of the user vector and the (cached) reply vector
+    "conversation",     # the whole turn as one text, as stores held before variants existed
+)
+
+# ----------------------------------------------------
+# model backends
+# ----------------------------------------------------
+BACKENDS = ("torch", "onnx-int8")
+ONNX_DIR = Path("embedding_onnx")       # exported + quantized models, one subdir per model
+ONNX_QCONFIG = "avx2"                   # avx2 | avx512 | avx512_vnni | arm64
+MIN_COSINE = 0.98                       # int8 vectors must stay this close to fp32
+
+# Fixed probe set for the fp32 vs int8 comparison, in the shape the store embeds
+_ACCURACY_PROBES = [
+    "User: hey\nKai: ",
+    "User: i'm tired\nKai: ",
+    "User: idk\nKai: ",
+    "User: I can't stop thinking about what she said yesterday\nKai: That sounds like it really stuck with you.",
+    "User: work has been crushing me lately and I feel like nobody notices\nKai: ",
+    "User: I finally finished the project!!\nKai: That's huge, congratulations!",
+    "User: do you ever feel lonely?\nKai: ",
+    "User: my dog died this morning\nKai: I'm so sorry. Do you want to talk about him?",
+]
+
+def _onnx_int8_model(qconfig: str = ONNX_QCONFIG, root: Path = ONNX_DIR) -> Optional[SentenceTransformer]:
+    """Load the int8 ONNX export of MODEL_NAME, exporting and checking it once.
+
+    Returns None when the export fails or its vectors drift too far from
+    fp32, so the caller can fall back to the PyTorch model.
+    """
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    save_dir = root / MODEL_NAME
+    file_name = f"onnx/model_qint8_{qconfig}.onnx"
+    report_path = save_dir / f"accuracy_qint8_{qconfig}.json"
+
+    if not (save_dir / file_name).exists():
+        print(f"[Embeddings] Exporting {MODEL_NAME} to int8 ONNX ({qconfig}) in {save_dir}/ ...")
+        onnx_model = SentenceTransformer(MODEL_NAME, backend="onnx")
+        onnx_model.save_pretrained(str(save_dir))
+        export_dynamic_quantized_onnx_model(onnx_model, qconfig, str(save_dir))
+
+        # One-time accuracy check against the fp32 model; the result is kept next to the export
+        reference = SentenceTransformer(MODEL_NAME).encode(_ACCURACY_PROBES, normalize_embeddings=True)
+        candidate = SentenceTransformer(
+            str(save_dir), backend="onnx", model_kwargs={"file_name": file_name}
+        ).encode(_ACCURACY_PROBES, normalize_embeddings=True)
+        cosines = (reference * candidate).sum(axis=1)
+        report = {"qconfig": qconfig, "min_cosine": float(cosines.min()), "mean_cosine": float(cosines.mean())}
+        report_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"[Embeddings] int8 vs fp32 cosine: min {report['min_cosine']:.4f}, mean {report['mean_cosine']:.4f}")
+
+    report = json.loads(report_path.read_text(encoding="utf-8")) if report_path.exists() else {}
+    if report.get("min_cosine", 0.0) < MIN_COSINE:
+        print(f"[Embeddings] int8 model failed the accuracy check ({report or 'no report'}); not using it.")
+        return None
+    return SentenceTransformer(str(save_dir), backend="onnx", model_kwargs={"file_name": file_name})
+
+def load_model(backend: str = "torch", onnx_qconfig: str = ONNX_QCONFIG) -> tuple[SentenceTransformer, str]:
+    """Return the shared embedding model for `backend` and the backend actually used."""
+    if backend not in BACKENDS:
+        raise ValueError(f"embedding backend must be one of {BACKENDS}, got {backend!r}")
+    if backend == "onnx-int8":
+        try:
+            model = registry.get_or_register(
+                f"embedding:onnx-int8:{onnx_qconfig}", lambda: _onnx_int8_model(onnx_qconfig)
+            )
+            if model is not None:
+                return model, backend
+        except Exception as e:
+            # Missing optimum/onnxruntime or a failed export
+            print(f"[Embeddings] int8 ONNX backend unavailable: {e}")
+        print("[Embeddings] Falling back to the fp32 PyTorch model.")
+    return registry.get_or_register("embedding:torch", lambda: SentenceTransformer(MODEL_NAME)), "torch"
+
+class EmbeddingCache:
+    """LRU of float32 vectors keyed by the sha1 of the exact text embedded.
+
+    Bounded by entry count and total bytes; optionally saved to an .npz
+    file on close and reloaded on start so restarts are not cold.
+    """
+
+    def __init__(self, max_entries: int = CACHE_ENTRIES, max_bytes: int = CACHE_MB * 1024 * 1024,
+                 path: Optional[Path | str] = None, namespace: str = ""):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = Path(path) if path else None
+        # Vectors from different model backends differ slightly, so they never share keys
+        self.namespace = namespace
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.path is not None and self.path.exists():
+            self._load()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        k = self.key(text)
+        with self._lock:
+            vector = self._entries.get(k)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(k)
+            self.hits += 1
+            return vector
+
+    def put(self, text: str, vector) -> None:
+        self._put(self.key(text), np.asarray(vector, dtype=np.float32))
+
+    def _put(self, k: str, vector: np.ndarray) -> None:
+        if self.max_entries <= 0 or vector.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(k, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._entries[k] = vector
+            self._bytes += vector.nbytes
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            keys = list(self._entries)
+            vectors = list(self._entries.values())
+        if not keys:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so a crash never leaves a half-written cache behind
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with tmp.open("wb") as f:
+            np.savez(f, keys=np.array(keys), vectors=np.stack(vectors))
+        tmp.replace(self.path)
+        print(f"[EmbeddingCache] Saved {len(keys)} vectors to {self.path}")
+
+    def _load(self) -> None:
+        try:
+            with np.load(self.path) as data:
+                # Oldest first, so the most recently used survive the bounds
+                for k, vector in zip(data["keys"].tolist(), data["vectors"]):
+                    self._put(k, vector.astype(np.float32))
+            print(f"[EmbeddingCache] Loaded {len(self._entries)} vectors from {self.path}")
+        except Exception as e:
+            print(f"[EmbeddingCache] Ignoring unreadable cache {self.path}: {e}")
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+class TurnEmbedding:
+    """The user-message embedding of one chat turn, computed at most once.
+
+    Retrieval and storage for the turn share this object, so the message
+    is encoded once however many stages need its vector.
+    """
+
+    def __init__(self, pipeline: "EmbeddingPipeline", user_msg: str):
+        self.pipeline = pipeline
+        self.user_msg = user_msg
+        self.vector: Optional[list[float]] = None
+        self._lock = threading.Lock()
+
+    def encode(self) -> list[float]:
+        with self._lock:
+            if self.vector is None:
+                self.vector = self.pipeline.encode(self.pipeline.user_text(self.user_msg))
+            return self.vector
 
 class EmbeddingPipeline:
-    def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        
+    """Batched, cached sentence embeddings.
+
+    The model is resolved from the registry on the first encode (or an
+    explicit `load()`), not at construction, so building a pipeline at
+    import time costs nothing.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_wait_ms: float = MAX_WAIT_MS,
+        cache_entries: int = CACHE_ENTRIES,
+        cache_mb: float = CACHE_MB,
+        cache_path: Optional[Path | str] = None,
+        backend: str = "torch",
+        onnx_qconfig: str = ONNX_QCONFIG,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"embedding backend must be one of {BACKENDS}, got {backend!r}")
+        self.backend = backend              # the backend actually used once loaded
+        self.onnx_qconfig = onnx_qconfig
+        self._model: Optional[SentenceTransformer] = None
+        self._model_lock = threading.Lock()
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        # Repeated inputs ("hey", "idk") skip the model entirely; the namespace
+        # is set in load(), once the backend is known
+        self.cache = EmbeddingCache(cache_entries, int(cache_mb * 1024 * 1024), cache_path)
+
+        # Concurrent turns queue their texts here; one thread encodes them together
+        self._queue: "queue.Queue[tuple[str, Future]]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.encoded = 0
+        self._stopping = False
+        self._thread = threading.Thread(target=self._batch_loop, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    # ----------------------------------------------------
+    # public API
+    # ----------------------------------------------------
+    @property
+    def model(self) -> SentenceTransformer:
+        return self.load()
+
+    def load(self) -> SentenceTransformer:
+        """Resolve the shared model for this pipeline's backend, once."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    model, self.backend = load_model(self.backend, self.onnx_qconfig)
+                    # Vectors from a fallback backend must not answer for the requested one
+                    self.cache.namespace = f"{MODEL_NAME}:{self.backend}"
+                    self._model = model
+        return self._model
+
+    @staticmethod
+    def conversation_text(user_msg: str, ai_response: str) -> str:
+        """The exact text `encode_conversation` embeds for a turn."""
+        return f"User: {user_msg}\nKai: {ai_response}"
+
+    @staticmethod
+    def user_text(user_msg: str) -> str:
+        """The text a user message (and any retrieval query) is embedded as."""
+        return EmbeddingPipeline.conversation_text(user_msg, "")
+
+    @staticmethod
+    def reply_text(ai_response: str) -> str:
+        return f"Kai: {ai_response}"
+
     def encode_conversation(self, user_msg: str, ai_response: str) -> list[float]:
-        chunk_text = f"User: {user_msg}\nKai: {ai_response}"
-        return self.model.encode(chunk_text).tolist()
\ No newline at end of file
+        return self.encode(self.conversation_text(user_msg, ai_response))
+
+    def begin_turn(self, user_msg: str) -> TurnEmbedding:
+        return TurnEmbedding(self, user_msg)
+
+    def encode_interactions(
+        self,
+        variant: str,
+        turns: list[tuple[str, str]],
+        user_vectors: Optional[list[Optional[list[float]]]] = None,
+        use_cache: bool = True,
+    ) -> list[list[float]]:
+        """Embed (user message, reply) pairs the way `variant` stores them.
+
+        Entries of `user_vectors` that are already known (from the turn's
+        retrieval) are reused instead of re-encoding the user message.
+        """
+        if variant not in EMBEDDING_VARIANTS:
+            raise ValueError(f"variant must be one of {EMBEDDING_VARIANTS}, got {variant!r}")
+        if not turns:
+            return []
+        if variant == "conversation":
+            return self.encode_many([self.conversation_text(u, r) for u, r in turns], use_cache)
+
+        users = list(user_vectors) if user_vectors is not None else [None] * len(turns)
+        missing = [i for i, v in enumerate(users) if v is None]
+        if missing:
+            encoded = self.encode_many([self.user_text(turns[i][0]) for i in missing], use_cache)
+            for i, vector in zip(missing, encoded):
+                users[i] = vector
+        if variant == "user":
+            return users
+
+        replies = self.encode_many([self.reply_text(r) for _, r in turns], use_cache)
+        combined = _unit(np.asarray(users, dtype=np.float32)) + _unit(np.asarray(replies, dtype=np.float32))
+        return _unit(combined).tolist()
+
+    def encode(self, text: str) -> list[float]:
+        """Embed one text; batched with whatever other callers are encoding."""
+        self.load()
+        cached = self.cache.get(text)
+        if cached is not None:
+            return cached.tolist()
+        future: Future = Future()
+        self._queue.put((text, future))
+        vector = future.result()
+        self.cache.put(text, vector)
+        return vector
+
+    def encode_many(self, texts: list[str], use_cache: bool = True) -> list[list[float]]:
+        """Embed a list of texts directly, for bulk callers such as re-indexing.
+
+        One-off bulk jobs pass `use_cache=False` so they don't flush the
+        hot conversational entries out of the cache.
+        """
+        self.load()
+        out: list = [self.cache.get(t) for t in texts] if use_cache else [None] * len(texts)
+        missing = [i for i, v in enumerate(out) if v is None]
+        if missing:
+            vectors = self.model.encode([texts[i] for i in missing], batch_size=self.max_batch_size)
+            self._record(len(missing))
+            for i, vector in zip(missing, vectors):
+                if use_cache:
+                    self.cache.put(texts[i], vector)
+                out[i] = vector
+        return [np.asarray(v, dtype=np.float32).tolist() for v in out]
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "backend": self.backend,
+                "loaded": self._model is not None,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queued": self._queue.qsize(),
+                "batches": self.batches,
+                "encoded": self.encoded,
+                "avg_batch_size": round(self.encoded / self.batches, 2) if self.batches else 0.0,
+                "cache": self.cache.stats(),
+            }
+
+    def close(self) -> None:
+        self._stopping = True
+        self._thread.join(timeout=5.0)
+        self.cache.save()
+
+    # ----------------------------------------------------
+    # batching front-end
+    # ----------------------------------------------------
+    def _batch_loop(self) -> None:
+        while not self._stopping:
+            try:
+                batch = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Identical texts in one batch (e.g. several users saying "hey") run once
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = self.model.encode(texts, batch_size=len(texts))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self._record(len(texts))
+            by_text = dict(zip(texts, vectors))
+            for text, future in batch:
+                future.set_result(by_text[text].tolist())
+
+    def _record(self, n: int) -> None:
+        with self._stats_lock:
+            self.batches += 1
+            self.encoded += n
@@ -0,0 +1,101 @@
+# emotion_aggregates.py
+"""Running per-session emotion statistics for the vector stores.
+
+Each saved interaction updates its session's tallies, so memory stats and
+emotional-pattern lookups read a small summary instead of deserializing
+every stored row.
+"""
+
+from __future__ import annotations
+
+from collections import Counter, defaultdict, deque
+from typing import List
+import heapq
+import itertools
+
+try:
+    from backend.api.emotion_weights import EMOTION_KEYWORDS
+except ImportError:
+    from emotion_weights import EMOTION_KEYWORDS
+
+EMOTION_THRESHOLD = 0.5     # score above which an emotion counts as significant
+AGGREGATE_TOP_K = 20        # intense moments kept per emotion (and overall) per session
+EMOTION_CATEGORIES = tuple(EMOTION_KEYWORDS)
+
+
+def emotion_field(emotion: str) -> str:
+    return f"emotion_{emotion}"
+
+
+def emotion_fields(emotions: dict) -> dict:
+    """Typed metadata for one interaction, so stores can filter on intensity.
+
+    Every category gets a numeric `emotion_<name>` field (0.0 when absent)
+    plus `dominant_emotion`/`dominant_score`; the JSON `emotions` blob is
+    kept alongside for readers that want the raw scores.
+    """
+    fields = {emotion_field(e): float(emotions.get(e, 0.0)) for e in EMOTION_CATEGORIES}
+    if emotions:
+        dominant = max(emotions, key=emotions.get)
+        fields.update(dominant_emotion=dominant, dominant_score=float(emotions[dominant]))
+    else:
+        fields.update(dominant_emotion="none", dominant_score=0.0)
+    return fields
+
+
+class SessionAggregates:
+    def __init__(self, top_k: int = AGGREGATE_TOP_K, threshold: float = EMOTION_THRESHOLD):
+        self.top_k = top_k
+        self.threshold = threshold
+        self.total = 0
+        self.counts: Counter[str] = Counter()               # interactions with the emotion above threshold
+        self.sums: defaultdict[str, float] = defaultdict(float)
+        self.last_seen: dict[str, str] = {}                 # latest timestamp above threshold
+        # emotion -> min-heap of (score, seq, moment); seq keeps ties off the dicts
+        self._top: defaultdict[str, list] = defaultdict(list)
+        # Latest interactions with any significant emotion, oldest first
+        self._recent: deque = deque(maxlen=top_k)
+        self._seq = itertools.count()
+
+    def add(self, document: str, emotions: dict, timestamp: str) -> None:
+        self.total += 1
+        moment = {"content": document, "emotions": emotions, "timestamp": timestamp}
+        for emotion, score in emotions.items():
+            self.sums[emotion] += score
+            if score <= self.threshold:
+                continue
+            self.counts[emotion] += 1
+            self.last_seen[emotion] = max(self.last_seen.get(emotion, ""), timestamp)
+            heap = self._top[emotion]
+            item = (score, next(self._seq), moment)
+            if len(heap) < self.top_k:
+                heapq.heappush(heap, item)
+            elif score > heap[0][0]:
+                heapq.heapreplace(heap, item)
+        if emotions and max(emotions.values()) > self.threshold:
+            self._recent.append(moment)
+
+    def top(self, emotion: str, limit: int) -> List[dict]:
+        """Most intense moments for `emotion`, strongest first."""
+        ranked = sorted(self._top.get(emotion, []), key=lambda item: item[0], reverse=True)
+        return [{**moment, "emotion_intensity": score} for score, _, moment in ranked[:limit]]
+
+    def recent(self, limit: int) -> List[dict]:
+        """Latest moments with any significant emotion, newest first."""
+        moments = sorted(self._recent, key=lambda m: m["timestamp"], reverse=True)[:limit]
+        return [{**m, "dominant_emotion": max(m["emotions"], key=m["emotions"].get)} for m in moments]
+
+    def summary(self) -> dict:
+        return {
+            "total_interactions": self.total,
+            "emotional_breakdown": dict(self.counts),
+            "mean_scores": {e: round(s / self.total, 4) for e, s in self.sums.items()} if self.total else {},
+            "last_seen": dict(self.last_seen),
+            "top_moments": {
+                emotion: [
+                    {"timestamp": m["timestamp"], "score": m["emotion_intensity"], "content": m["content"]}
+                    for m in self.top(emotion, self.top_k)
+                ]
+                for emotion in self._top
+            },
+        }
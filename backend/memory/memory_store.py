@@ -1,36 +1,204 @@
 from __future__ import annotations
 
-from collections import defaultdict, Counter
+from collections import defaultdict, Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
 from pathlib import Path
 from typing import List, Optional
+from urllib.parse import quote, unquote
+import asyncio
 import json
+import os
+import threading
 
-MEMORY_FILE = Path("eden_memory.json")
+MEMORY_DIR = Path("eden_memory")                # one append-only shard per session
+MEMORY_FILE = Path("eden_memory.json")          # legacy snapshot, migrated on first start
+MEMORY_LOG = Path("eden_memory.log.jsonl")      # legacy change log, migrated with it
+MAX_RESIDENT_SESSIONS = 1000                    # sessions kept in RAM before LRU eviction
+FSYNC_POLICIES = ("never", "commit")            # fsync touched shards on every commit or leave it to the OS
+IO_WORKERS = 4                                  # threads behind the awaitable a* methods
 
 class Memory_Store:
     # ----------------------------------------------------
     # ctor / bootstrap
     # ----------------------------------------------------
-    def __init__(self) -> None:
-        self.sessions: dict[str, List[dict]] = defaultdict(list)
+    def __init__(
+        self,
+        root: Path | str = MEMORY_DIR,
+        max_resident_sessions: int = MAX_RESIDENT_SESSIONS,
+        write_behind: bool = False,
+        flush_interval_ms: float = 50.0,
+        flush_max_records: int = 256,
+        fsync: str = "never",
+        io_workers: int = IO_WORKERS,
+    ) -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.root = Path(root)
+        self.max_resident_sessions = max(1, max_resident_sessions)
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.flush_max_records = flush_max_records
+        self.fsync = fsync
+        # Resident sessions only, least recently used first
+        self.sessions: OrderedDict[str, List[dict]] = OrderedDict()
+        # Per-session tag tallies kept in step with `sessions` so flag checks are O(1)
+        self._tag_counts: dict[str, Counter[str]] = {}
+
+        # Saves land in RAM at once and queue here until the next group commit.
+        # Sessions with queued entries are never evicted, so RAM stays the
+        # source of truth until their shard catches up.
+        self._pending: list[tuple[str, dict]] = []
+        self._dirty: Counter[str] = Counter()
+        self._lock = threading.RLock()       # RAM state + queue
+        self._io_lock = threading.Lock()     # one commit at a time
+        self._wake = threading.Event()
+        self._stopping = False
+
+        if not self.root.exists():
+            self.root.mkdir(parents=True)
+            self._migrate_legacy()
+
+        # Runs the blocking methods for their awaitable counterparts
+        self._executor = ThreadPoolExecutor(max_workers=max(1, io_workers), thread_name_prefix="memory-io")
+
+        self._flusher: Optional[threading.Thread] = None
+        if write_behind:
+            self._flusher = threading.Thread(target=self._flush_loop, name="memory-flusher", daemon=True)
+            self._flusher.start()
+
+    # ----------------------------------------------------
+    # shard helpers
+    # ----------------------------------------------------
+    def _shard(self, session_id: str) -> Path:
+        return self.root / f"{quote(session_id, safe='')}.jsonl"
+
+    def _read_shard(self, session_id: str) -> List[dict]:
+        path = self._shard(session_id)
+        if not path.exists():
+            return []
+        entries = []
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Torn final line from a crash mid-write
+                    continue
+        return entries
+
+    def _session(self, session_id: str) -> List[dict]:
+        """Return the session's entries, loading its shard on first touch."""
+        entries = self.sessions.get(session_id)
+        if entries is not None:
+            self.sessions.move_to_end(session_id)
+            return entries
+
+        entries = self._read_shard(session_id)
+        self.sessions[session_id] = entries
+        self._tag_counts[session_id] = Counter(t for e in entries for t in e.get("tags", []))
+        while len(self.sessions) > self.max_resident_sessions:
+            victim = next(
+                (sid for sid in self.sessions if sid != session_id and sid not in self._dirty),
+                None,
+            )
+            if victim is None:
+                break
+            del self.sessions[victim]
+            self._tag_counts.pop(victim, None)
+        return entries
+
+    def _migrate_legacy(self) -> None:
+        """Split a pre-shard eden_memory.json (+ change log) into per-session shards."""
+        sessions: dict[str, List[dict]] = defaultdict(list)
+        snapshot_seq = 0
         if MEMORY_FILE.exists():
-            self._load()
+            with MEMORY_FILE.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, list):
+                sessions["default"] = data
+            elif "sessions" in data and "log_seq" in data:
+                sessions.update(data["sessions"])
+                snapshot_seq = data["log_seq"]
+            else:
+                sessions.update(data)
+        if MEMORY_LOG.exists():
+            with MEMORY_LOG.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if record.get("seq", 0) <= snapshot_seq:
+                        continue
+                    if record["op"] == "save":
+                        sessions[record["session_id"]].append(record["entry"])
+                    elif record["op"] == "clear":
+                        sessions[record["session_id"]] = []
+                    elif record["op"] == "clear_all":
+                        sessions.clear()
+
+        for session_id, entries in sessions.items():
+            with self._shard(session_id).open("w", encoding="utf-8") as f:
+                f.writelines(json.dumps(e) + "\n" for e in entries)
+        if sessions:
+            print(f"[Memory_Store] Migrated {len(sessions)} sessions into {self.root}/")
 
     # ----------------------------------------------------
-    # core persistence helpers
+    # group commit
     # ----------------------------------------------------
-    def _persist(self) -> None:
-        with MEMORY_FILE.open("w", encoding="utf-8") as f:
-            json.dump(self.sessions, f, indent=2)
-
-    def _load(self) -> None:
-        with MEMORY_FILE.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-        if isinstance(data, list):
-            self.sessions = defaultdict(list, {"default": data})
-        else:
-            self.sessions = defaultdict(list, {k: v for k, v in data.items()})
+    def flush(self) -> int:
+        """Append every queued entry to its shard; returns the number written."""
+        with self._io_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+
+            by_session: dict[str, list[dict]] = defaultdict(list)
+            for session_id, entry in batch:
+                by_session[session_id].append(entry)
+
+            written: list[str] = []
+            try:
+                for session_id, entries in by_session.items():
+                    with self._shard(session_id).open("a", encoding="utf-8") as f:
+                        f.writelines(json.dumps(e) + "\n" for e in entries)
+                        if self.fsync == "commit":
+                            f.flush()
+                            os.fsync(f.fileno())
+                    written.append(session_id)
+            finally:
+                with self._lock:
+                    for session_id in written:
+                        self._dirty[session_id] -= len(by_session[session_id])
+                        if self._dirty[session_id] <= 0:
+                            del self._dirty[session_id]
+                    # Anything not written goes back to the head of the queue
+                    retry = [(sid, e) for sid, e in batch if sid not in written]
+                    self._pending = retry + self._pending
+            return len(batch)
+
+    def _flush_loop(self) -> None:
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # Unwritten entries were requeued; the next commit retries them
+                print(f"[Memory_Store] Group commit failed: {e}")
+
+    def close(self) -> None:
+        """Stop the flusher and commit whatever is still queued."""
+        self._stopping = True
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5.0)
+            self._flusher = None
+        self._executor.shutdown(wait=True)
+        self.flush()
 
     # ----------------------------------------------------
     # public API
@@ -50,8 +218,18 @@ class Memory_Store:
             "emotion": emotion,
             "tags": tags or [],
         }
-        self.sessions[session_id].append(entry)
-        self._persist()
+        with self._lock:
+            self._session(session_id).append(entry)
+            self._tag_counts[session_id].update(entry["tags"])
+            self._pending.append((session_id, entry))
+            self._dirty[session_id] += 1
+            backlog = len(self._pending)
+
+        # One appended line per save; O(1) regardless of history size
+        if not self.write_behind:
+            self.flush()
+        elif backlog >= self.flush_max_records:
+            self._wake.set()
 
     def get_recent(
         self,
@@ -60,39 +238,59 @@ class Memory_Store:
         speaker: Optional[str] = None,
         tag_filter: Optional[list[str]] = None,
     ) -> List[dict]:
-        records = self.sessions.get(session_id, [])
         out: list[dict] = []
-
-        for entry in reversed(records):
-            if speaker and entry["speaker"] != speaker:
-                continue
-            if tag_filter and not any(t in entry["tags"] for t in tag_filter):
-                continue
-            out.append(entry)
-            if len(out) == limit:
-                break
+        with self._lock:
+            records = self._session(session_id)
+            for entry in reversed(records):
+                if speaker and entry["speaker"] != speaker:
+                    continue
+                if tag_filter and not any(t in entry["tags"] for t in tag_filter):
+                    continue
+                out.append(entry)
+                if len(out) == limit:
+                    break
         return list(reversed(out))
 
+    def list_sessions(self) -> List[str]:
+        # The shard directory is the session index; no history is read
+        on_disk = [unquote(p.stem) for p in self.root.glob("*.jsonl")]
+        with self._lock:
+            not_yet_flushed = [sid for sid in self._dirty if sid not in on_disk]
+        return on_disk + not_yet_flushed
+
     def tag_counts(self, session_id: str = "default") -> dict[str, int]:
-        counts: Counter[str] = Counter()
-        for entry in self.sessions.get(session_id, []):
-            counts.update(entry.get("tags", []))
-        return dict(counts)
+        with self._lock:
+            self._session(session_id)
+            return dict(self._tag_counts[session_id])
 
     def count_tag(self, tag: str, session_id: str = "default") -> int:
-        return sum(tag in entry.get("tags", []) for entry in self.sessions.get(session_id, []))
+        with self._lock:
+            self._session(session_id)
+            return self._tag_counts[session_id][tag]
 
     def clear(self, session_id: str = "default") -> None:
-        self.sessions[session_id] = []
-        self._persist()
+        # Holding the I/O lock means no commit is half-way through this shard
+        with self._io_lock, self._lock:
+            self._pending = [(sid, e) for sid, e in self._pending if sid != session_id]
+            self._dirty.pop(session_id, None)
+            self._session(session_id).clear()
+            self._tag_counts[session_id] = Counter()
+            self._shard(session_id).write_text("", encoding="utf-8")
 
     def clear_all(self) -> None:
-        self.sessions.clear()
-        self._persist()
+        with self._io_lock, self._lock:
+            self._pending.clear()
+            self._dirty.clear()
+            self.sessions.clear()
+            self._tag_counts.clear()
+            for path in self.root.glob("*.jsonl"):
+                path.unlink()
 
     def get_trust_history(self, session_id: str = "default", speaker: Optional[str] = None) -> List[tuple[str, float]]:
         history = []
-        for entry in self.sessions.get(session_id, []):
+        with self._lock:
+            entries = list(self._session(session_id))
+        for entry in entries:
             if speaker and entry.get("speaker") != speaker:
                 continue
             for tag in entry.get("tags", []):
@@ -115,3 +313,25 @@ class Memory_Store:
             tags=[trust_tag],
             session_id=session_id,
         )
+
+    # ----------------------------------------------------
+    # async API (for the event loop; same semantics as above)
+    # ----------------------------------------------------
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    async def asave(self, *args, **kwargs) -> None:
+        await self._run(self.save, *args, **kwargs)
+
+    async def aget_recent(self, *args, **kwargs) -> List[dict]:
+        return await self._run(self.get_recent, *args, **kwargs)
+
+    async def acount_tag(self, *args, **kwargs) -> int:
+        return await self._run(self.count_tag, *args, **kwargs)
+
+    async def aclear(self, *args, **kwargs) -> None:
+        await self._run(self.clear, *args, **kwargs)
+
+    async def aclear_all(self) -> None:
+        await self._run(self.clear_all)
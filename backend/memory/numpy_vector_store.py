@@ -0,0 +1,196 @@
+try:
+    from .vector_memory_store import VectorMemoryStore, IO_WORKERS
+    from .embeddings import EmbeddingPipeline
+    from .emotion_aggregates import EMOTION_THRESHOLD, emotion_field
+except ImportError:
+    from vector_memory_store import VectorMemoryStore, IO_WORKERS
+    from embeddings import EmbeddingPipeline
+    from emotion_aggregates import EMOTION_THRESHOLD, emotion_field
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
+import threading
+
+import numpy as np
+
+INITIAL_ROWS = 64       # rows allocated per session before the first doubling
+
+
+class SessionIndex:
+    """One session's embeddings in a contiguous, growable float32 matrix.
+
+    Rows are L2-normalized on insert so a single matrix-vector product
+    gives cosine similarity; ids, documents and metadata live in parallel
+    lists indexed by row.
+    """
+
+    def __init__(self, dim: int):
+        self.vectors = np.empty((INITIAL_ROWS, dim), dtype=np.float32)
+        self.size = 0
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[dict] = []
+        self._row_of: Dict[str, int] = {}
+
+    def add(self, ids: List[str], documents: List[str], embeddings: np.ndarray, metadatas: List[dict]) -> None:
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.maximum(norms, 1e-12)
+        for id_, doc, vector, meta in zip(ids, documents, embeddings, metadatas):
+            row = self._row_of.get(id_)
+            if row is not None:
+                # Upsert in place
+                self.vectors[row] = vector
+                self.documents[row] = doc
+                self.metadatas[row] = meta
+                continue
+            if self.size == len(self.vectors):
+                grown = np.empty((2 * len(self.vectors), self.vectors.shape[1]), dtype=np.float32)
+                grown[: self.size] = self.vectors[: self.size]
+                self.vectors = grown
+            self.vectors[self.size] = vector
+            self._row_of[id_] = self.size
+            self.ids.append(id_)
+            self.documents.append(doc)
+            self.metadatas.append(meta)
+            self.size += 1
+
+    def remove(self, ids: set) -> None:
+        """Drop rows whose id is in `ids`, compacting the matrix in place."""
+        keep = [row for row, id_ in enumerate(self.ids) if id_ not in ids]
+        if len(keep) == self.size:
+            return
+        self.vectors[: len(keep)] = self.vectors[keep]
+        self.ids = [self.ids[row] for row in keep]
+        self.documents = [self.documents[row] for row in keep]
+        self.metadatas = [self.metadatas[row] for row in keep]
+        self._row_of = {id_: row for row, id_ in enumerate(self.ids)}
+        self.size = len(keep)
+
+    def search(self, query: np.ndarray, k: int) -> List[tuple[int, float]]:
+        """Top-k rows by cosine similarity as (row, similarity), best first."""
+        if self.size == 0 or k <= 0:
+            return []
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        sims = self.vectors[: self.size] @ query
+        k = min(k, self.size)
+        top = np.argpartition(-sims, k - 1)[:k] if k < self.size else np.arange(self.size)
+        top = top[np.argsort(-sims[top])]
+        return [(int(row), float(sims[row])) for row in top]
+
+
+class NumpyVectorMemoryStore(VectorMemoryStore):
+    """VectorMemoryStore backed by per-session NumPy matrices instead of Chroma.
+
+    Retrieval is always scoped to one session, so a brute-force scan of
+    that session's few hundred rows beats a filtered query against a
+    global HNSW index. Vectors live in process memory only; use
+    `rebuild_from(memory_store)` to repopulate after a restart. For the
+    same reason every row holds this store's embedding variant, so search
+    needs no variant filter.
+    """
+
+    def __init__(
+        self,
+        io_workers: int = IO_WORKERS,
+        embedding_pipeline: Optional[EmbeddingPipeline] = None,
+        write_behind: bool = False,
+        flush_interval_ms: float = 100.0,
+        flush_max_items: int = 64,
+        embedding_variant: str = "user",
+    ):
+        self.embedding_pipeline = embedding_pipeline or EmbeddingPipeline()
+        self.embedding_variant = self._check_variant(embedding_variant)
+        self.path = None
+        self._sessions: Dict[str, SessionIndex] = {}
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, io_workers), thread_name_prefix="vector-io")
+        self._init_write_behind(write_behind, flush_interval_ms, flush_max_items)
+        self._init_aggregates()
+        print("[VectorStore] Using in-process NumPy index")
+
+    # ----------------------------------------------------
+    # storage primitives
+    # ----------------------------------------------------
+    def count(self) -> int:
+        with self._lock:
+            return sum(index.size for index in self._sessions.values())
+
+    def needs_rebuild(self) -> bool:
+        return self.count() == 0
+
+    def search(self, query_embedding: List[float], session_id: str, limit: int) -> List[tuple[str, dict, float]]:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        with self._lock:
+            index = self._sessions.get(session_id)
+            if index is None:
+                return []
+            hits = index.search(query, limit)
+            return [(index.documents[row], index.metadatas[row], 1.0 - sim) for row, sim in hits]
+
+    def _add(self, ids: List[str], documents: List[str], embeddings: List[List[float]], metadatas: List[dict]) -> None:
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        with self._lock:
+            # Rows are grouped by session; a batch may span several
+            for session_id in dict.fromkeys(m["session_id"] for m in metadatas):
+                rows = [i for i, m in enumerate(metadatas) if m["session_id"] == session_id]
+                index = self._sessions.get(session_id)
+                if index is None:
+                    index = self._sessions[session_id] = SessionIndex(vectors.shape[1])
+                index.add(
+                    [ids[i] for i in rows],
+                    [documents[i] for i in rows],
+                    vectors[rows],
+                    [metadatas[i] for i in rows],
+                )
+
+    _upsert = _add
+
+    def _session_ids(self, session_id: str) -> List[str]:
+        with self._lock:
+            index = self._sessions.get(session_id)
+            return list(index.ids) if index is not None else []
+
+    def _metadatas_for(self, session_id: str, ids: List[str]) -> List[dict]:
+        with self._lock:
+            index = self._sessions.get(session_id)
+            if index is None:
+                return []
+            return [index.metadatas[index._row_of[id_]] for id_ in ids if id_ in index._row_of]
+
+    def _delete(self, ids: List[str]) -> None:
+        wanted = set(ids)
+        with self._lock:
+            for session_id, index in list(self._sessions.items()):
+                index.remove(wanted)
+                if index.size == 0:
+                    del self._sessions[session_id]
+
+    def _session_metadatas(self, session_id: str) -> tuple[List[str], List[dict]]:
+        with self._lock:
+            index = self._sessions.get(session_id)
+            if index is None:
+                return [], []
+            return list(index.documents), list(index.metadatas)
+
+    def _significant_rows(self, session_id: str, emotion_type: Optional[str]) -> tuple[List[str], List[dict]]:
+        field = emotion_field(emotion_type) if emotion_type else "dominant_score"
+        documents, metadatas = self._session_metadatas(session_id)
+        rows = [(d, m) for d, m in zip(documents, metadatas) if m.get(field, 0.0) > EMOTION_THRESHOLD]
+        return [d for d, _ in rows], [m for _, m in rows]
+
+    def migrate_emotion_metadata(self, batch_size: int = 0) -> int:
+        # Rows only ever come from save_interaction/rebuild_from in this process
+        return 0
+
+    def _reembed_other_variants(self, batch_size: int = 0) -> int:
+        # Every row was embedded with this store's variant
+        return 0
+
+    # ----------------------------------------------------
+    # session-wide queries
+    # ----------------------------------------------------
+    def clear_session_memories(self, session_id: str):
+        self._forget_session(session_id)
+        with self._lock:
+            index = self._sessions.pop(session_id, None)
+        if index is not None:
+            print(f"[VectorStore] Cleared {index.size} memories for session: {session_id}")
@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Iterable, List, Optional
+import asyncio
+import sqlite3
+import threading
+
+MEMORY_DB = Path("eden_memory.db")
+IO_WORKERS = 4      # threads behind the awaitable a* methods
+_ALL_HISTORY = 10**9        # get_recent limit that means "everything"
+
+# SQLite flavour of the sessions/messages tables in Docs/database_schema.sql,
+# with tags normalized into their own table so tag queries hit an index
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id          TEXT PRIMARY KEY,
+    created_at  TEXT NOT NULL,
+    last_active TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id  TEXT NOT NULL REFERENCES sessions(id),
+    timestamp   TEXT NOT NULL,
+    speaker     TEXT NOT NULL,
+    message     TEXT NOT NULL,
+    emotion     TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS tags (
+    message_id  INTEGER NOT NULL REFERENCES messages(id) ON DELETE CASCADE,
+    session_id  TEXT NOT NULL,
+    tag         TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_messages_session_id ON messages(session_id, id);
+CREATE INDEX IF NOT EXISTS idx_tags_session_tag ON tags(session_id, tag);
+CREATE INDEX IF NOT EXISTS idx_tags_message_id ON tags(message_id);
+"""
+
+
+class SqlMemoryStore:
+    """Drop-in replacement for Memory_Store backed by SQLite in WAL mode.
+
+    Nothing is cached in process memory; every query is an index lookup,
+    so RAM stays flat no matter how much history accumulates.
+    """
+
+    # ----------------------------------------------------
+    # ctor / bootstrap
+    # ----------------------------------------------------
+    def __init__(self, path: Path | str = MEMORY_DB, io_workers: int = IO_WORKERS) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, io_workers), thread_name_prefix="sql-memory-io")
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._conn.close()
+
+    # ----------------------------------------------------
+    # internals
+    # ----------------------------------------------------
+    def _insert(self, session_id: str, entry: dict) -> None:
+        self._conn.execute(
+            "INSERT INTO sessions (id, created_at, last_active) VALUES (?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET last_active = excluded.last_active",
+            (session_id, entry["timestamp"], entry["timestamp"]),
+        )
+        cur = self._conn.execute(
+            "INSERT INTO messages (session_id, timestamp, speaker, message, emotion) VALUES (?, ?, ?, ?, ?)",
+            (session_id, entry["timestamp"], entry["speaker"], entry["message"], entry["emotion"]),
+        )
+        self._conn.executemany(
+            "INSERT INTO tags (message_id, session_id, tag) VALUES (?, ?, ?)",
+            [(cur.lastrowid, session_id, tag) for tag in entry["tags"]],
+        )
+
+    def _tags_for(self, messages_sql: str, params: list) -> dict[int, list[str]]:
+        """Tags of the rows `messages_sql` selects, joined against that same query.
+
+        One bound parameter per message id would hit SQLite's variable
+        limit for large `limit`s; the join costs no extra parameters.
+        """
+        tags: dict[int, list[str]] = {}
+        for row in self._conn.execute(
+            f"SELECT t.message_id, t.tag FROM tags t JOIN ({messages_sql}) m ON m.id = t.message_id "
+            "ORDER BY t.rowid",
+            params,
+        ):
+            tags.setdefault(row["message_id"], []).append(row["tag"])
+        return tags
+
+    # ----------------------------------------------------
+    # public API
+    # ----------------------------------------------------
+    def save(
+        self,
+        speaker: str,
+        message: str,
+        emotion: str = "neutral",
+        tags: Optional[list[str]] = None,
+        session_id: str = "default",
+    ) -> None:
+        entry = {
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+            "speaker": speaker,
+            "message": message,
+            "emotion": emotion,
+            "tags": tags or [],
+        }
+        with self._lock, self._conn:
+            self._insert(session_id, entry)
+
+    def import_sessions(self, source) -> int:
+        """Bulk-load history from a Memory_Store, or from a {session_id: entries} mapping.
+
+        A store (anything with `list_sessions`/`get_recent`) is walked one
+        session at a time, e.g. `import_sessions(Memory_Store())`. Don't pass
+        `Memory_Store().sessions`: it only holds the shards resident in RAM,
+        which right after startup is none of them.
+        """
+        if hasattr(source, "list_sessions"):
+            sessions: Iterable[tuple[str, Iterable[dict]]] = (
+                (sid, source.get_recent(limit=_ALL_HISTORY, session_id=sid)) for sid in source.list_sessions()
+            )
+        else:
+            sessions = source.items()
+        count = 0
+        with self._lock, self._conn:
+            for session_id, entries in sessions:
+                for entry in entries:
+                    self._insert(session_id, {
+                        "timestamp": entry.get("timestamp", ""),
+                        "speaker": entry.get("speaker", ""),
+                        "message": entry.get("message", ""),
+                        "emotion": entry.get("emotion", "neutral"),
+                        "tags": entry.get("tags", []),
+                    })
+                    count += 1
+        return count
+
+    def get_recent(
+        self,
+        limit: int = 10,
+        session_id: str = "default",
+        speaker: Optional[str] = None,
+        tag_filter: Optional[list[str]] = None,
+    ) -> List[dict]:
+        sql = "SELECT id, timestamp, speaker, message, emotion FROM messages WHERE session_id = ?"
+        params: list = [session_id]
+        if speaker:
+            sql += " AND speaker = ?"
+            params.append(speaker)
+        if tag_filter:
+            marks = ",".join("?" * len(tag_filter))
+            sql += f" AND id IN (SELECT message_id FROM tags WHERE session_id = ? AND tag IN ({marks}))"
+            params += [session_id, *tag_filter]
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            tags = self._tags_for(sql, params) if rows else {}
+        return [
+            {
+                "timestamp": row["timestamp"],
+                "speaker": row["speaker"],
+                "message": row["message"],
+                "emotion": row["emotion"],
+                "tags": tags.get(row["id"], []),
+            }
+            for row in reversed(rows)
+        ]
+
+    def list_sessions(self) -> List[str]:
+        with self._lock:
+            return [row["id"] for row in self._conn.execute("SELECT id FROM sessions ORDER BY created_at")]
+
+    def tag_counts(self, session_id: str = "default") -> dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT tag, COUNT(*) AS n FROM tags WHERE session_id = ? GROUP BY tag",
+                (session_id,),
+            ).fetchall()
+        return {row["tag"]: row["n"] for row in rows}
+
+    def count_tag(self, tag: str, session_id: str = "default") -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM tags WHERE session_id = ? AND tag = ?",
+                (session_id, tag),
+            ).fetchone()
+        return row[0]
+
+    def clear(self, session_id: str = "default") -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tags WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+
+    def clear_all(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tags")
+            self._conn.execute("DELETE FROM messages")
+            self._conn.execute("DELETE FROM sessions")
+
+    def get_trust_history(self, session_id: str = "default", speaker: Optional[str] = None) -> List[tuple[str, float]]:
+        sql = (
+            "SELECT m.timestamp, t.tag FROM tags t JOIN messages m ON m.id = t.message_id "
+            "WHERE t.session_id = ? AND t.tag LIKE 'affect:trust:%'"
+        )
+        params: list = [session_id]
+        if speaker:
+            sql += " AND m.speaker = ?"
+            params.append(speaker)
+        sql += " ORDER BY m.id"
+
+        history = []
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        for row in rows:
+            parts = row["tag"].split(":")
+            try:
+                if len(parts) == 4:
+                    history.append((row["timestamp"], float(parts[-1])))
+            except ValueError:
+                continue
+        return history
+
+    def save_affect_score(self, persona: str, trust_score: float, session_id: str = "default") -> None:
+        trust_tag = f"affect:trust:{persona}:{trust_score:.2f}"
+        self.save(
+            speaker=persona,
+            message=f"[affect-trust-update] {trust_score:.2f}",
+            emotion="neutral",
+            tags=[trust_tag],
+            session_id=session_id,
+        )
+
+    # ----------------------------------------------------
+    # async API (for the event loop; same semantics as above)
+    # ----------------------------------------------------
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    async def asave(self, *args, **kwargs) -> None:
+        await self._run(self.save, *args, **kwargs)
+
+    async def aget_recent(self, *args, **kwargs) -> List[dict]:
+        return await self._run(self.get_recent, *args, **kwargs)
+
+    async def acount_tag(self, *args, **kwargs) -> int:
+        return await self._run(self.count_tag, *args, **kwargs)
+
+    async def aclear(self, *args, **kwargs) -> None:
+        await self._run(self.clear, *args, **kwargs)
+
+    async def aclear_all(self) -> None:
+        await self._run(self.clear_all)
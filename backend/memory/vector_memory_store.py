@@ -1,25 +1,79 @@
 try: 
-    from .embeddings import EmbeddingPipeline
+    from .embeddings import EmbeddingPipeline, TurnEmbedding, EMBEDDING_VARIANTS
+    from .emotion_aggregates import SessionAggregates, AGGREGATE_TOP_K, EMOTION_THRESHOLD, emotion_field, emotion_fields
 except ImportError:
-    from embeddings import EmbeddingPipeline
+    from embeddings import EmbeddingPipeline, TurnEmbedding, EMBEDDING_VARIANTS
+    from emotion_aggregates import SessionAggregates, AGGREGATE_TOP_K, EMOTION_THRESHOLD, emotion_field, emotion_fields
 import chromadb
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict
+from functools import partial
+from pathlib import Path
+from time import perf_counter
+from collections import OrderedDict, deque
+from typing import Callable, List, Dict, Optional
+import asyncio
+import itertools
 import json
+import threading
 
-class VectorMemoryStore:
-    def __init__(self):
-        self.embedding_pipeline = EmbeddingPipeline()
-        self.client = chromadb.Client()
+import numpy as np
 
-        #Handle collection creation more safely
-        try:
-            self.collection = self.client.get_collection(name="conversations")
-        except ValueError:
-            self.collection = self.client.create_collection(    
-                name="conversations",
-                metadata={"hnsw:space": "cosine"}
-            )
+IO_WORKERS = 4              # threads behind the awaitable a* methods (embedding + Chroma I/O)
+VECTOR_DB_PATH = Path("eden_vectors")
+REBUILD_BATCH_SIZE = 256    # turns embedded + written per batch by rebuild_from
+_ALL_HISTORY = 10**9        # get_recent limit that means "everything"
+MAX_PENDING = 4096          # queued write-behind interactions before the oldest are dropped
+MAX_FLUSH_ATTEMPTS = 3      # failed writes of one interaction before it is given up on
+DEAD_LETTER_MAX = 1000      # given-up interactions kept for inspection
+MAX_RESIDENT_AGGREGATES = 1000  # sessions whose emotion aggregates stay in RAM before LRU eviction
+
+class VectorMemoryStore:
+    # Until rebuild_from has re-embedded a collection written under another
+    # variant, its old rows stay searchable rather than vanishing
+    _legacy_search = False
+
+    def __init__(
+        self,
+        io_workers: int = IO_WORKERS,
+        embedding_pipeline: Optional[EmbeddingPipeline] = None,
+        path: Optional[Path | str] = VECTOR_DB_PATH,
+        write_behind: bool = False,
+        flush_interval_ms: float = 100.0,
+        flush_max_items: int = 64,
+        embedding_variant: str = "user",
+    ):
+        #Concurrent saves/queries from the worker threads share one batched, cached encoder
+        self.embedding_pipeline = embedding_pipeline or EmbeddingPipeline()
+        self.embedding_variant = self._check_variant(embedding_variant)
+        #On-disk collection survives restarts; path=None keeps the old in-memory client
+        self.path = Path(path) if path else None
+        self.client = chromadb.PersistentClient(path=str(self.path)) if self.path else chromadb.Client()
+        #Embedding and Chroma calls block; the a* methods run them here instead of on the event loop
+        self._executor = ThreadPoolExecutor(max_workers=max(1, io_workers), thread_name_prefix="vector-io")
+        self._init_write_behind(write_behind, flush_interval_ms, flush_max_items)
+        self._init_aggregates()
+
+        self.collection = self.client.get_or_create_collection(
+            name="conversations",
+            metadata={"hnsw:space": "cosine"}
+        )
+        where = f"at {self.path}/" if self.path else "in memory"
+        print(f"[VectorStore] Collection 'conversations' {where} holds {self.collection.count()} interactions")
+        if self.collection.count() and self.needs_rebuild():
+            self._legacy_search = True
+            print(f"[VectorStore] Some stored vectors don't use the '{self.embedding_variant}' embedding; "
+                  f"searching all of them until rebuild_from re-embeds history")
+
+    @staticmethod
+    def _check_variant(variant: str) -> str:
+        if variant not in EMBEDDING_VARIANTS:
+            raise ValueError(f"embedding_variant must be one of {EMBEDDING_VARIANTS}, got {variant!r}")
+        return variant
+
+    def begin_turn(self, user_msg: str) -> TurnEmbedding:
+        """Shared embedding context for one chat turn (pass it to retrieval and save)."""
+        return self.embedding_pipeline.begin_turn(user_msg)
 
     # def save_interaction(self, user_msg: str, ai_response: str, emotional_data: dict, session_id):
     #     pass
@@ -32,34 +86,180 @@ class VectorMemoryStore:
         
 
     
-    def save_interaction(self, user_msg: str, ai_response: str, emotional_data: dict, session_id: str):
+    def save_interaction(
+        self,
+        user_msg: str,
+        ai_response: str,
+        emotional_data: dict,
+        session_id: str,
+        turn: Optional[TurnEmbedding] = None,
+    ):
         #Save user-AI interaction with emotion context to vector database
         try:
-            #Generate embedding for the full conversation context
-            embedding = self.embedding_pipeline.encode_conversation(user_msg, ai_response)
-
-            #Create unique ID to avoid duplicates
-            interaction_id = f"{session_id}_{int(datetime.now().timestamp() * 1000)}"
-            
-            #Store in vector DB
-            self.collection.add(
-                documents=[F"User: {user_msg}\nAI: {ai_response}"],
-                embeddings=[embedding],
-                metadatas=[{
+            #Create unique ID to avoid duplicates (the counter separates saves in the same millisecond)
+            interaction_id = f"{session_id}_{int(datetime.now().timestamp() * 1000)}_{next(self._seq)}"
+            record = {
+                "id": interaction_id,
+                #Already computed for this turn's retrieval, if it got that far
+                "user_vector": turn.vector if turn is not None else None,
+                "document": F"User: {user_msg}\nAI: {ai_response}",
+                "metadata": {
                     "session_id": session_id,
                     "timestamp": datetime.now().isoformat(),
                     "emotions": json.dumps(emotional_data),
                     "user_message": user_msg,
                     "ai_response": ai_response,
                     "interaction_type": "conversation",
-                }],
+                    "embedding_variant": self.embedding_variant,
+                    **emotion_fields(emotional_data),
+                },
+            }
+            #Seeded from stored rows before this one exists anywhere, so it's counted once
+            aggregates = self._aggregates(session_id)
+
+            if self.write_behind:
+                #Embedded and written with the next batch; searchable right away via _search_pending
+                with self._pending_lock:
+                    self._pending.append(record)
+                    #Writes keep failing: shed the oldest rather than grow without bound
+                    overflow = max(0, len(self._pending) - MAX_PENDING)
+                    dropped, self._pending = self._pending[:overflow], self._pending[overflow:]
+                    backlog = len(self._pending)
+                if dropped:
+                    self._give_up(dropped, f"write-behind queue over {MAX_PENDING}")
+                if backlog >= self.flush_max_items:
+                    self._wake.set()
+                self._count_interaction(aggregates, record)
+                return
+
+            #Reuses the turn's user vector; only "user+reply"/"conversation" encode anything here
+            embedding = self._embed([record])[0]
+
+            #Store in vector DB
+            self._add(
+                documents=[record["document"]],
+                embeddings=[embedding],
+                metadatas=[record["metadata"]],
                 ids=[interaction_id]
             )
+            self._count_interaction(aggregates, record)
             print(f"[VectorStore] Saved interaction: {interaction_id}")
 
         except Exception as e:
             print(f"[VectorStore] Error saving interaction: {e}")
 
+    # ----------------------------------------------------
+    # write-behind batching
+    # ----------------------------------------------------
+    def _init_write_behind(self, write_behind: bool, flush_interval_ms: float, flush_max_items: int) -> None:
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.flush_max_items = max(1, flush_max_items)
+        self._seq = itertools.count()
+        #Queued interactions, then the batch currently being written; both stay searchable
+        self._pending: List[dict] = []
+        self._flushing: List[dict] = []
+        #Interactions that could not be written (history keeps them; rebuild_from restores them)
+        self.dead_letters: deque = deque(maxlen=DEAD_LETTER_MAX)
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._flusher: Optional[threading.Thread] = None
+        if write_behind:
+            self._flusher = threading.Thread(target=self._flush_loop, name="vector-flusher", daemon=True)
+            self._flusher.start()
+
+    def flush(self) -> int:
+        """Embed every queued interaction in one batch and write them with one add."""
+        with self._flush_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+                self._flushing = batch
+            if not batch:
+                return 0
+            failed: List[dict] = []
+            try:
+                self._write(batch)
+            except Exception as e:
+                #One bad record must not block the rest: retry them one at a time
+                failed = batch if len(batch) == 1 else [r for r in batch if not self._try_write(r)]
+                retry = self._count_failures(failed, e)
+                #Back to the head of the queue for the next attempt
+                with self._pending_lock:
+                    self._pending = retry + self._pending
+                if failed:
+                    raise
+            finally:
+                with self._pending_lock:
+                    self._flushing = []
+            print(f"[VectorStore] Saved {len(batch)} interactions in one batch")
+            return len(batch)
+
+    def _write(self, records: List[dict]) -> None:
+        self._add(
+            ids=[r["id"] for r in records],
+            documents=[r["document"] for r in records],
+            embeddings=self._embed(records),
+            metadatas=[r["metadata"] for r in records],
+        )
+
+    def _try_write(self, record: dict) -> bool:
+        try:
+            self._write([record])
+            return True
+        except Exception:
+            return False
+
+    def _count_failures(self, records: List[dict], error: Exception) -> List[dict]:
+        """Records still worth retrying; the rest go to the dead-letter list."""
+        retry, exhausted = [], []
+        for record in records:
+            record["attempts"] = record.get("attempts", 0) + 1
+            (exhausted if record["attempts"] >= MAX_FLUSH_ATTEMPTS else retry).append(record)
+        if exhausted:
+            self._give_up(exhausted, f"{MAX_FLUSH_ATTEMPTS} failed writes, last: {error}")
+        return retry
+
+    def _give_up(self, records: List[dict], reason: str) -> None:
+        self.dead_letters.extend(records)
+        print(f"[VectorStore] Dropped {len(records)} interactions ({reason}): {[r['id'] for r in records]}")
+
+    def _flush_loop(self) -> None:
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[VectorStore] Batch write failed: {e}")
+
+    def _drop_pending(self, session_id: str) -> None:
+        with self._flush_lock, self._pending_lock:
+            self._pending = [r for r in self._pending if r["metadata"]["session_id"] != session_id]
+
+    def _embed(self, records: List[dict], use_cache: bool = True) -> List[List[float]]:
+        """Vectors for queued/new records in this store's embedding variant."""
+        return self.embedding_pipeline.encode_interactions(
+            self.embedding_variant,
+            [(r["metadata"]["user_message"], r["metadata"]["ai_response"]) for r in records],
+            [r.get("user_vector") for r in records],
+            use_cache=use_cache,
+        )
+
+    def _search_pending(self, query_embedding: List[float], session_id: str, limit: int) -> List[tuple[str, dict, float]]:
+        """Brute-force search over interactions that are queued but not yet written."""
+        with self._pending_lock:
+            items = [r for r in (*self._flushing, *self._pending) if r["metadata"]["session_id"] == session_id]
+        if not items:
+            return []
+        #Same texts the flush will embed, so the embedding cache serves both
+        vectors = np.asarray(self._embed(items), dtype=np.float32)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        sims = vectors @ query / np.maximum(np.linalg.norm(vectors, axis=1) * np.linalg.norm(query), 1e-12)
+        order = np.argsort(-sims)[:limit]
+        return [(items[i]["document"], items[i]["metadata"], 1.0 - float(sims[i])) for i in order]
+
     
     def build_emotional_context(self, emotions: dict, affect: dict) -> str:
         """
@@ -96,7 +296,9 @@ class VectorMemoryStore:
         return context
 
         
-    def get_contextual_memory(self, query: str, session_id: str, limit: int = 3) -> List[dict]:
+    def get_contextual_memory(
+        self, query: str, session_id: str, limit: int = 3, turn: Optional[TurnEmbedding] = None
+    ) -> List[dict]:
         """
         Retrieve contextually relevant memories based on semantic similarity
 
@@ -104,30 +306,27 @@ class VectorMemoryStore:
             query: Current user message or context 
             session_id: Current session identifier
             limit: Maximum number of memories to retrieve
+            turn: The turn's shared embedding; its vector is computed here and reused by the save
 
         Returns:
             List of relevant conversation memories with metadata
         """
         try:
             #Generate embedding for the query
-            query_embedding = self.embedding_pipeline.encode_conversation(query, "")
-
-            #Search for similar interactions in this session
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                where={"session_id": session_id},
-                n_results = limit,
-                include=["documents", "metadatas", "distances"]
-            )
+            if turn is not None:
+                query_embedding = turn.encode()
+            else:
+                query_embedding = self.embedding_pipeline.encode(self.embedding_pipeline.user_text(query))
+
+            #Search for similar interactions in this session, including ones not yet written
+            hits = self.search(query_embedding, session_id, limit)
+            if self.write_behind:
+                hits = sorted(hits + self._search_pending(query_embedding, session_id, limit), key=lambda h: h[2])[:limit]
 
             #Process and return structured results
             contextual_memories = []
-            if results["documents"] and results["documents"][0]:
-                for i, (doc, metadata, distance) in enumerate(zip(
-                    results["documents"][0],
-                    results["metadatas"][0],
-                    results["distances"][0],
-                )):
+            if hits:
+                for i, (doc, metadata, distance) in enumerate(hits):
                     memory = {
                         "content": doc,
                         "user_message": metadata.get("user_message", ""),
@@ -140,7 +339,7 @@ class VectorMemoryStore:
                     contextual_memories.append(memory)
 
                 print(f"[VectorStore] Retrieved {len(contextual_memories)} contextual memories for query: '{query[:50]}...'")
-                return contextual_memories
+            return contextual_memories
             
         except Exception as e:
             print(f"[VectorStore] Error retrieving contextual memory: {e}")
@@ -187,66 +386,37 @@ class VectorMemoryStore:
     def get_emotional_patterns(self, session_id: str, emotion_type: str = None, limit: int = 5) -> List[dict]:
         #Retrieve past interactions with specific emotional patterns
         try:
-            # #Build where clause for emotional filtering
-            where_clause = {"session_id": session_id}
-            #Query all interactions for this session
-            results = self.collection.query(
-                query_embeddings=None,     #Get all without similarity search
-                where=where_clause,
-                n_results=limit * 3, #Get more to filter by emotion
-                include=["metadatas", "documents"]
-            )
+            if limit > AGGREGATE_TOP_K:
+                return self._scan_emotional_patterns(session_id, emotion_type, limit)
+            aggregates = self._aggregates(session_id)
+            with self._agg_lock:
+                #Strongest moments for one emotion, or the latest significant ones
+                if emotion_type:
+                    return aggregates.top(emotion_type, limit)
+                return aggregates.recent(limit)
 
-            emotional_memories = []
-            if results["metadatas"] and results["metadatas"][0]:
-                for doc, metadata in zip(results["documents"][0], results["metadatas"][0]):
-                    emotions = json.loads(metadata.get("emotions", "{}"))
-
-                    #Filter by emotion type if specified
-                    if emotion_type:
-                        if emotion_type in emotions and emotions[emotion_type] > 0.5:
-                            emotional_memories.append({
-                                "content": doc,
-                                "emotions": emotions,
-                                "timestamp": metadata.get("timestamp", ""),
-                                "emotion_intensity": emotions.get(emotion_type, 0)
-                            })
-                    else:
-                        #Return any interaction with significant emotions
-                        if emotions and max(emotions.values()) > 0.5:
-                            emotional_memories.append({
-                                "content": doc,
-                                "emotions": emotions,
-                                "timestamp": metadata.get("timestamp", ""),
-                                "dominant_emotion": max(emotions, key=emotions.get)
-                             })
-                    
-
-                #Sort by emotion intensity or timestamp
-            if emotion_type:
-                emotional_memories.sort(key=lambda x: x["emotion_intensity"], reverse=True)
-            else:
-                emotional_memories.sort(key=lambda x: x["timestamp"], reverse=True)
-                    
-            return emotional_memories[:limit]
-                
         except Exception as e:
             print(f"[VectorStore] Error retrieving emotional patters: {e}")
             return []
-        
+
+    def _scan_emotional_patterns(self, session_id: str, emotion_type: Optional[str], limit: int) -> List[dict]:
+        #Deeper than the aggregates keep: rank the rows the store says are significant
+        documents, metadatas = self._significant_rows(session_id, emotion_type)
+        aggregates = SessionAggregates(top_k=limit)
+        for doc, metadata in sorted(zip(documents, metadatas), key=lambda row: row[1].get("timestamp", "")):
+            aggregates.add(doc, json.loads(metadata.get("emotions", "{}")), metadata.get("timestamp", ""))
+        return aggregates.top(emotion_type, limit) if emotion_type else aggregates.recent(limit)
+
     def clear_session_memories(self, session_id: str):
         #Clear all memories for a specific session
+        self._forget_session(session_id)
         try:
             #Get all IDs for this session
-            results = self.collection.query(
-                query_embeddings=None,
-                where={"session_id": session_id},
-                include=["metadatas"]
-            )
+            results = self.collection.get(where={"session_id": session_id}, include=[])
 
-            if results["ids"] and results["ids"][0]:
-                self.collection.delete(ids=results['ids'][0])
-                print(f"[VectorStore] Cleared {len(results['ids'][0])} memories for session: {session_id}")
+            if results["ids"]:
+                self.collection.delete(ids=results["ids"])
+                print(f"[VectorStore] Cleared {len(results['ids'])} memories for session: {session_id}")
 
         except Exception as e:
             print(f"[VectorStore] Error clearing session memories: {e}")
@@ -254,34 +424,339 @@ class VectorMemoryStore:
     def get_memory_stats(self, session_id: str) -> Dict:
         #Get statistics about stored memories for a session
         try:
-            results = self.collection.query(
-                query_embeddings=None,
-                where={"session_id": session_id},
-                include=["metadatas"]
-            )
-
-            if not results["metadatas"] or not results["metadatas"][0]:
-                return {"total_interactions": 0, "emotional_breakdown": {}}
-                
-            total_interactions = len(results["metadatas"][0])
-            emotion_counts = {}
-
-            for metadata in results["metadatas"][0]:
-                emotions = json.loads(metadata.get("emotions", "{}"))
-                for emotion, score in emotions.items():
-                    if score > 0.5: #Only count significant emotions
-                        emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-                        
-            return {
-                    "total_interactions": total_interactions,
-                    "emotional_breakdown": emotion_counts,
+            aggregates = self._aggregates(session_id)
+            with self._agg_lock:
+                if not aggregates.total:
+                    return {"total_interactions": 0, "emotional_breakdown": {}}
+                return {
+                    "total_interactions": aggregates.total,
+                    "emotional_breakdown": dict(aggregates.counts),
                     "session_id": session_id
-            }
-                
+                }
+
         except Exception as e:
             print(f"[VectorStore] Error getting memory stats: {e}")
             return {"total_interactions": 0, "emotional_breakdown": {}}
 
+    def get_emotion_summary(self, session_id: str) -> Dict:
+        """Counts, mean scores, last-seen times and top moments per emotion for a session."""
+        aggregates = self._aggregates(session_id)
+        with self._agg_lock:
+            return {"session_id": session_id, **aggregates.summary()}
+
+    # ----------------------------------------------------
+    # per-session emotion aggregates
+    # ----------------------------------------------------
+    def _init_aggregates(self) -> None:
+        #Least recently used first; an evicted session is re-seeded from its rows on next touch
+        self._session_aggregates: "OrderedDict[str, SessionAggregates]" = OrderedDict()
+        self.max_resident_aggregates = MAX_RESIDENT_AGGREGATES
+        self._agg_lock = threading.Lock()
+
+    def _aggregates(self, session_id: str) -> SessionAggregates:
+        """The session's running tallies, built from its stored rows on first touch."""
+        with self._agg_lock:
+            aggregates = self._session_aggregates.get(session_id)
+            if aggregates is not None:
+                self._session_aggregates.move_to_end(session_id)
+        if aggregates is not None:
+            return aggregates
+
+        #No flush half-done, so every row is either stored or queued, never both
+        with self._flush_lock, self._pending_lock:
+            documents, metadatas = self._session_metadatas(session_id)
+            rows = list(zip(documents, metadatas)) + [
+                (r["document"], r["metadata"]) for r in self._pending if r["metadata"]["session_id"] == session_id
+            ]
+        aggregates = SessionAggregates()
+        for doc, metadata in sorted(rows, key=lambda row: row[1].get("timestamp", "")):
+            aggregates.add(doc, json.loads(metadata.get("emotions", "{}")), metadata.get("timestamp", ""))
+        with self._agg_lock:
+            aggregates = self._session_aggregates.setdefault(session_id, aggregates)
+            while len(self._session_aggregates) > self.max_resident_aggregates:
+                self._session_aggregates.popitem(last=False)
+            return aggregates
+
+    def _count_interaction(self, aggregates: SessionAggregates, record: dict) -> None:
+        metadata = record["metadata"]
+        with self._agg_lock:
+            aggregates.add(record["document"], json.loads(metadata["emotions"]), metadata["timestamp"])
+
+    def _forget_session(self, session_id: str) -> None:
+        self._drop_pending(session_id)
+        with self._agg_lock:
+            self._session_aggregates.pop(session_id, None)
+
+    # ----------------------------------------------------
+    # storage primitives (overridden by other index backends)
+    # ----------------------------------------------------
+    def count(self) -> int:
+        return self.collection.count()
+
+    def needs_rebuild(self) -> bool:
+        """True when the store is empty or holds vectors not embedded with this store's variant.
+
+        Counts rows rather than looking for any current-variant row: turns
+        saved live before a rebuild completed carry the new variant while
+        the rest of the collection still doesn't.
+        """
+        total = self.collection.count()
+        if not total:
+            return True
+        current = self.collection.get(where={"embedding_variant": self.embedding_variant}, include=[])
+        return len(current["ids"]) < total
+
+    def search(self, query_embedding: List[float], session_id: str, limit: int) -> List[tuple[str, dict, float]]:
+        """Nearest interactions of one session as (document, metadata, cosine distance)."""
+        #Vectors from another variant (or from before variants were recorded) aren't comparable,
+        #but until a rebuild they are all there is (and what every query was matched against before)
+        where = {"session_id": session_id}
+        if not self._legacy_search:
+            where = {"$and": [where, {"embedding_variant": self.embedding_variant}]}
+        results = self.collection.query(
+            query_embeddings=[query_embedding],
+            where=where,
+            n_results=limit,
+            include=["documents", "metadatas", "distances"]
+        )
+        if not results["documents"] or not results["documents"][0]:
+            return []
+        return list(zip(results["documents"][0], results["metadatas"][0], results["distances"][0]))
+
+    def _add(self, ids: List[str], documents: List[str], embeddings: List[List[float]], metadatas: List[dict]) -> None:
+        self.collection.add(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+
+    def _upsert(self, ids: List[str], documents: List[str], embeddings: List[List[float]], metadatas: List[dict]) -> None:
+        self.collection.upsert(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+
+    def _session_ids(self, session_id: str) -> List[str]:
+        return self.collection.get(where={"session_id": session_id}, include=[])["ids"]
+
+    def _metadatas_for(self, session_id: str, ids: List[str]) -> List[dict]:
+        return self.collection.get(ids=ids, include=["metadatas"])["metadatas"] if ids else []
+
+    def _delete(self, ids: List[str]) -> None:
+        if ids:
+            self.collection.delete(ids=ids)
+
+    def _session_metadatas(self, session_id: str) -> tuple[List[str], List[dict]]:
+        results = self.collection.get(where={"session_id": session_id}, include=["documents", "metadatas"])
+        return results["documents"] or [], results["metadatas"] or []
+
+    def _significant_rows(self, session_id: str, emotion_type: Optional[str]) -> tuple[List[str], List[dict]]:
+        """Rows where `emotion_type` (or, without one, the dominant emotion) scores above threshold."""
+        field = emotion_field(emotion_type) if emotion_type else "dominant_score"
+        results = self.collection.get(
+            where={"$and": [{"session_id": session_id}, {field: {"$gt": EMOTION_THRESHOLD}}]},
+            include=["documents", "metadatas"],
+        )
+        return results["documents"] or [], results["metadatas"] or []
+
+    # ----------------------------------------------------
+    # migration
+    # ----------------------------------------------------
+    def migrate_emotion_metadata(self, batch_size: int = REBUILD_BATCH_SIZE) -> int:
+        """Add typed emotion fields to rows saved before they existed.
+
+        Only metadata is rewritten (no re-embedding), and rows that already
+        have the fields are skipped, so this is cheap to run on every start.
+        Returns the number of rows updated.
+        """
+        typed = self.collection.get(where={"dominant_score": {"$gte": 0.0}}, include=[])
+        total = self.collection.count()
+        if len(typed["ids"]) >= total:
+            return 0
+        print(f"[VectorStore] Adding typed emotion fields to {total - len(typed['ids'])} interactions")
+
+        updated = 0
+        for offset in range(0, total, batch_size):
+            page = self.collection.get(limit=batch_size, offset=offset, include=["metadatas"])
+            stale = [(id_, m) for id_, m in zip(page["ids"], page["metadatas"]) if "dominant_score" not in m]
+            if not stale:
+                continue
+            self.collection.update(
+                ids=[id_ for id_, _ in stale],
+                metadatas=[emotion_fields(json.loads(m.get("emotions", "{}"))) for _, m in stale],
+            )
+            updated += len(stale)
+        print(f"[VectorStore] Migrated emotion metadata for {updated} interactions")
+        return updated
 
+    def _reembed_other_variants(self, batch_size: int = REBUILD_BATCH_SIZE) -> int:
+        """Re-embed rows stored under another (or no) variant from their own metadata.
 
-
+        Covers sessions a full rebuild found no history for, so that
+        afterwards every row is on the active variant. Returns the number
+        of rows updated.
+        """
+        total = self.collection.count()
+        updated = 0
+        for offset in range(0, total, batch_size):
+            page = self.collection.get(limit=batch_size, offset=offset, include=["metadatas"])
+            stale = [
+                (id_, m) for id_, m in zip(page["ids"], page["metadatas"])
+                if m.get("embedding_variant") != self.embedding_variant
+            ]
+            if not stale:
+                continue
+            self.collection.update(
+                ids=[id_ for id_, _ in stale],
+                embeddings=self.embedding_pipeline.encode_interactions(
+                    self.embedding_variant,
+                    [(m.get("user_message", ""), m.get("ai_response", "")) for _, m in stale],
+                    use_cache=False,
+                ),
+                metadatas=[{"embedding_variant": self.embedding_variant} for _ in stale],
+            )
+            updated += len(stale)
+        if updated:
+            print(f"[VectorStore] Re-embedded {updated} interactions without history in place")
+        return updated
+
+    # ----------------------------------------------------
+    # bulk rebuild
+    # ----------------------------------------------------
+    def _saved_since(self, session_id: str, snapshot: set) -> set:
+        """(user message, reply) pairs of a session stored or queued after `snapshot` was taken."""
+        new_ids = [id_ for id_ in self._session_ids(session_id) if id_ not in snapshot]
+        pairs = {
+            (m["user_message"], m["ai_response"]) for m in self._metadatas_for(session_id, new_ids)
+        }
+        with self._pending_lock:
+            pairs.update(
+                (r["metadata"]["user_message"], r["metadata"]["ai_response"])
+                for r in (*self._flushing, *self._pending) if r["metadata"]["session_id"] == session_id
+            )
+        return pairs
+
+    @staticmethod
+    def _turns_from(entries: List[dict]) -> List[tuple[dict, dict]]:
+        """Pair each user message with the persona reply that followed it."""
+        turns = []
+        pending_user = None
+        for entry in entries:
+            tags = entry.get("tags", [])
+            if entry.get("speaker") == "user":
+                #Deflected (flagged) messages never reached the vector store live either
+                pending_user = None if any(t.startswith("flag:") for t in tags) else entry
+            elif pending_user is not None and "response" in tags:
+                turns.append((pending_user, entry))
+                pending_user = None
+        return turns
+
+    @staticmethod
+    def _emotions_from(tags: List[str]) -> dict:
+        #User messages carry their scores as emotion:<name>:<score> tags
+        emotions = {}
+        for tag in tags:
+            parts = tag.split(":")
+            if len(parts) == 3 and parts[0] == "emotion":
+                try:
+                    emotions[parts[1]] = float(parts[2])
+                except ValueError:
+                    continue
+        return emotions
+
+    def rebuild_from(
+        self,
+        memory_store,
+        session_ids: Optional[List[str]] = None,
+        batch_size: int = REBUILD_BATCH_SIZE,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> int:
+        """Re-embed historical turns from a Memory_Store (or SqlMemoryStore).
+
+        Safe to run while chats are being served. Only the rows a session
+        held before its history was read are replaced, and only after the
+        new rows are written, so retrieval never goes empty and interactions
+        saved live during the rebuild are kept (and not duplicated). It can
+        be re-run, and moves old vectors onto the active embedding variant.
+        Turns are embedded and written `batch_size` at a time;
+        `progress(done, total)` is called after every batch. Returns the
+        number of interactions written.
+        """
+        sessions = session_ids if session_ids is not None else memory_store.list_sessions()
+        #Queued rows become stored rows, so they are part of the snapshot below
+        self.flush()
+        work = []
+        stale: Dict[str, List[str]] = {}
+        for session_id in sessions:
+            #Snapshot ids before reading history: anything saved after this is newer than the rebuild
+            stale[session_id] = self._session_ids(session_id)
+            entries = memory_store.get_recent(limit=_ALL_HISTORY, session_id=session_id)
+            live = self._saved_since(session_id, set(stale[session_id]))
+            work.extend(
+                (session_id, i, user, reply) for i, (user, reply) in enumerate(self._turns_from(entries))
+                #Saved live in the window between the snapshot and the history read
+                if (user["message"], reply["message"]) not in live
+            )
+        total = len(work)
+        print(f"[VectorStore] Rebuilding {total} interactions from {len(sessions)} sessions")
+
+        started = perf_counter()
+        done = 0
+        for start in range(0, total, batch_size):
+            batch = work[start:start + batch_size]
+            embeddings = self.embedding_pipeline.encode_interactions(
+                self.embedding_variant, [(u["message"], r["message"]) for _, _, u, r in batch], use_cache=False
+            )
+            batch_emotions = [self._emotions_from(u.get("tags", [])) for _, _, u, _ in batch]
+            self._upsert(
+                ids=[f"{session_id}_rebuild_{i}" for session_id, i, _, _ in batch],
+                documents=[f"User: {u['message']}\nAI: {r['message']}" for _, _, u, r in batch],
+                embeddings=embeddings,
+                metadatas=[{
+                    "session_id": session_id,
+                    "timestamp": u.get("timestamp", ""),
+                    "emotions": json.dumps(emotions),
+                    "user_message": u["message"],
+                    "ai_response": r["message"],
+                    "interaction_type": "conversation",
+                    "embedding_variant": self.embedding_variant,
+                    **emotion_fields(emotions),
+                } for (session_id, _, u, r), emotions in zip(batch, batch_emotions)],
+            )
+            done += len(batch)
+            rate = done / max(perf_counter() - started, 1e-9)
+            print(f"[VectorStore] Rebuild: {done}/{total} interactions ({rate:.0f}/s)")
+            if progress is not None:
+                progress(done, total)
+
+        #Rebuilt ids are deterministic; a re-run overwrites its own rows rather than deleting them
+        rebuilt = {f"{session_id}_rebuild_{i}" for session_id, i, _, _ in work}
+        for session_id in sessions:
+            self._delete([id_ for id_ in stale[session_id] if id_ not in rebuilt])
+        if session_ids is None:
+            self._reembed_other_variants(batch_size)
+            self._legacy_search = False
+        #Re-seeded from the rebuilt rows on next use
+        with self._agg_lock:
+            for session_id in sessions:
+                self._session_aggregates.pop(session_id, None)
+        return done
+
+    # ----------------------------------------------------
+    # async API (for the event loop; same semantics as above)
+    # ----------------------------------------------------
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    async def asave_interaction(self, *args, **kwargs) -> None:
+        await self._run(self.save_interaction, *args, **kwargs)
+
+    async def aget_contextual_memory(self, *args, **kwargs) -> List[dict]:
+        return await self._run(self.get_contextual_memory, *args, **kwargs)
+
+    async def aget_emotion_summary(self, *args, **kwargs) -> Dict:
+        return await self._run(self.get_emotion_summary, *args, **kwargs)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self._stopping = True
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5.0)
+            self._flusher = None
+        self.flush()
+        self.embedding_pipeline.close()
@@ -0,0 +1,145 @@
+# model_registry.py
+"""Process-wide registry of shared, lazily loaded models.
+
+Loading a model is slow and each copy costs hundreds of megabytes, so
+the embedding model, the causal LM, its tokenizer and the VADER analyzer
+are loaded at most once per process and handed out to every store,
+script and persona that asks for them.
+
+Owners register a loader under a name; the first `get(name)` runs it
+(exactly once, even when several threads ask at the same time) and
+records how long it took and how much memory it added.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, Callable, Optional
+
+
+def _rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None where it can't be read."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+def _tensor_bytes(obj: Any) -> Optional[int]:
+    """Parameter + buffer bytes for torch modules (SentenceTransformer included)."""
+    if not hasattr(obj, "parameters") or not hasattr(obj, "buffers"):
+        return None
+    try:
+        return sum(t.nelement() * t.element_size() for t in (*obj.parameters(), *obj.buffers()))
+    except Exception:
+        return None
+
+
+@dataclass
+class _Slot:
+    loader: Callable[[], Any]
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    value: Any = None
+    loaded: bool = False
+    load_seconds: Optional[float] = None
+    rss_delta: Optional[int] = None
+    tensor_bytes: Optional[int] = None
+
+
+class ModelRegistry:
+    def __init__(self) -> None:
+        self._slots: dict[str, _Slot] = {}
+        self._lock = threading.Lock()
+
+    # ----------------------------------------------------
+    # registration
+    # ----------------------------------------------------
+    def register(self, name: str, loader: Callable[[], Any]) -> None:
+        """Register (or replace, if not yet loaded) the loader for `name`."""
+        with self._lock:
+            slot = self._slots.get(name)
+            if slot is not None and slot.loaded:
+                return
+            self._slots[name] = _Slot(loader)
+
+    def get(self, name: str) -> Any:
+        """Return the shared instance for `name`, loading it on first use."""
+        with self._lock:
+            slot = self._slots.get(name)
+        if slot is None:
+            raise KeyError(f"No model registered under '{name}'")
+        if slot.loaded:
+            return slot.value
+
+        with slot.lock:
+            if not slot.loaded:
+                rss_before = _rss_bytes()
+                started = perf_counter()
+                slot.value = slot.loader()
+                slot.load_seconds = round(perf_counter() - started, 2)
+                rss_after = _rss_bytes()
+                if rss_before is not None and rss_after is not None:
+                    slot.rss_delta = rss_after - rss_before
+                slot.tensor_bytes = _tensor_bytes(slot.value)
+                slot.loaded = True
+                print(f"[ModelRegistry] Loaded '{name}' in {slot.load_seconds}s ({self._describe(slot)})")
+        return slot.value
+
+    def get_or_register(self, name: str, loader: Callable[[], Any]) -> Any:
+        """`get(name)`, registering `loader` first if nothing is registered yet."""
+        with self._lock:
+            if name not in self._slots:
+                self._slots[name] = _Slot(loader)
+        return self.get(name)
+
+    def is_loaded(self, name: str) -> bool:
+        with self._lock:
+            slot = self._slots.get(name)
+        return slot is not None and slot.loaded
+
+    # ----------------------------------------------------
+    # reporting
+    # ----------------------------------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            slots = dict(self._slots)
+        return {
+            name: {
+                "loaded": slot.loaded,
+                "load_seconds": slot.load_seconds,
+                "rss_delta_mb": round(slot.rss_delta / 2**20, 1) if slot.rss_delta is not None else None,
+                "tensor_mb": round(slot.tensor_bytes / 2**20, 1) if slot.tensor_bytes is not None else None,
+            }
+            for name, slot in slots.items()
+        }
+
+    def report(self) -> None:
+        with self._lock:
+            slots = dict(self._slots)
+        for name, slot in slots.items():
+            if slot.loaded:
+                print(f"[ModelRegistry] {name}: {slot.load_seconds}s ({self._describe(slot)})")
+            else:
+                print(f"[ModelRegistry] {name}: not loaded")
+
+    @staticmethod
+    def _describe(slot: _Slot) -> str:
+        parts = []
+        if slot.rss_delta is not None:
+            parts.append(f"rss +{slot.rss_delta / 2**20:.1f} MB")
+        if slot.tensor_bytes is not None:
+            parts.append(f"tensors {slot.tensor_bytes / 2**20:.1f} MB")
+        return ", ".join(parts) or "size unknown"
+
+
+# The one registry every module shares
+registry = ModelRegistry()
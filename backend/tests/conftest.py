@@ -0,0 +1,42 @@
+# conftest.py
+"""Shared fixtures: the repo root on sys.path and a download-free embedding pipeline."""
+
+import hashlib
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+DIM = 16
+
+
+class HashModel:
+    """Deterministic stand-in for the sentence-transformers model.
+
+    Equal texts get equal vectors and different texts unrelated ones, which
+    is all the stores and caches need.
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        self.calls += 1
+        digests = [hashlib.sha256(t.encode("utf-8")).digest()[:DIM] for t in texts]
+        return np.stack([np.frombuffer(d, dtype=np.uint8).astype(np.float32) - 127.5 for d in digests])
+
+
+@pytest.fixture
+def embedding_pipeline(monkeypatch):
+    pytest.importorskip("sentence_transformers")
+    from backend.memory import embeddings
+
+    monkeypatch.setattr(embeddings, "load_model", lambda backend, qconfig: (HashModel(), "torch"))
+    pipeline = embeddings.EmbeddingPipeline(max_wait_ms=0.0)
+    yield pipeline
+    pipeline.close()
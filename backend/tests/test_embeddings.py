@@ -0,0 +1,94 @@
+# test_embeddings.py
+"""EmbeddingCache bounds and persistence, and the pipeline's lazy model load."""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from backend.memory import embeddings
+from backend.memory.embeddings import EmbeddingCache
+
+
+def _vector(seed: float, dim: int = 4) -> np.ndarray:
+    return np.full(dim, seed, dtype=np.float32)
+
+
+def test_cache_evicts_least_recently_used_entry():
+    cache = EmbeddingCache(max_entries=2, max_bytes=1 << 20)
+    cache.put("a", _vector(1))
+    cache.put("b", _vector(2))
+    cache.get("a")
+    cache.put("c", _vector(3))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["entries"] == 2
+
+
+def test_cache_is_bounded_by_bytes():
+    cache = EmbeddingCache(max_entries=100, max_bytes=2 * _vector(0).nbytes)
+    for text in "abc":
+        cache.put(text, _vector(1))
+    assert cache.stats()["bytes"] == 2 * _vector(0).nbytes
+    assert cache.get("a") is None
+
+
+def test_cache_hits_misses_and_namespaces():
+    torch_cache = EmbeddingCache(namespace="model:torch")
+    torch_cache.put("hey", _vector(1))
+    assert torch_cache.get("hey") is not None
+    assert torch_cache.get("idk") is None
+    assert torch_cache.stats()["hits"] == 1 and torch_cache.stats()["misses"] == 1
+    assert EmbeddingCache(namespace="model:onnx-int8").key("hey") != torch_cache.key("hey")
+
+
+def test_cache_survives_save_and_load(tmp_path):
+    path = tmp_path / "cache.npz"
+    cache = EmbeddingCache(path=path)
+    cache.put("hey", _vector(1))
+    cache.put("idk", _vector(2))
+    cache.save()
+
+    reloaded = EmbeddingCache(path=path)
+    np.testing.assert_array_equal(reloaded.get("idk"), _vector(2))
+    # Entries load oldest first, so tight bounds keep the most recent
+    assert EmbeddingCache(max_entries=1, path=path).get("idk") is not None
+
+
+def test_pipeline_loads_the_model_on_first_encode(monkeypatch):
+    loads = []
+
+    class _Model:
+        def encode(self, texts, batch_size=32, **kwargs):
+            return np.ones((len(texts), 4), dtype=np.float32)
+
+    def load_model(backend, qconfig):
+        loads.append(backend)
+        return _Model(), "torch"     # as if the int8 export were unavailable
+
+    monkeypatch.setattr(embeddings, "load_model", load_model)
+    pipeline = embeddings.EmbeddingPipeline(backend="onnx-int8", max_wait_ms=0.0)
+    assert loads == [] and not pipeline.stats()["loaded"]
+
+    pipeline.encode("hey")
+    pipeline.encode("hey")
+    assert loads == ["onnx-int8"]
+    # The backend actually used names the cache, so fallback vectors never pose as int8 ones
+    assert pipeline.backend == "torch" and pipeline.cache.namespace.endswith(":torch")
+    assert pipeline.stats()["cache"]["hits"] == 1
+    pipeline.close()
+
+
+def test_encode_interactions_reuses_known_user_vectors(embedding_pipeline):
+    turns = [("hey", "hi there"), ("idk", "that's ok")]
+    known = embedding_pipeline.encode_interactions("user", turns[:1])
+    model = embedding_pipeline.model
+    calls = model.calls
+
+    vectors = embedding_pipeline.encode_interactions("user", turns, user_vectors=[known[0], None])
+    assert vectors[0] == known[0]
+    assert model.calls == calls + 1     # only "idk" was encoded
+
+    combined = np.asarray(embedding_pipeline.encode_interactions("user+reply", turns))
+    np.testing.assert_allclose(np.linalg.norm(combined, axis=1), 1.0, rtol=1e-5)
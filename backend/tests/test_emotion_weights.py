@@ -0,0 +1,48 @@
+# test_emotion_weights.py
+"""get_emotion_weights: whole-word matching, derived forms and phrases."""
+
+import pytest
+
+from backend.api.emotion_weights import EMOTION_KEYWORDS, get_emotion_weights
+
+
+@pytest.mark.parametrize("text", ["I made it", "beheld", "safety first", "misspelled", "a believer", "tearoom"])
+def test_words_that_only_contain_a_keyword_do_not_match(text):
+    assert get_emotion_weights(text) == {}
+
+
+@pytest.mark.parametrize("word, emotion", [
+    ("sadly", "sadness"),
+    ("sadness", "sadness"),
+    ("cried", "sadness"),
+    ("tearful", "sadness"),
+    ("anxiously", "anxiety"),
+    ("nervously", "anxiety"),
+    ("panicked", "anxiety"),
+    ("panicking", "anxiety"),
+    ("worries", "anxiety"),
+    ("stressful", "anxiety"),
+    ("emptiness", "emptiness"),
+    ("loneliness", "loneliness"),
+    ("gratefully", "joy"),
+    ("craving", "longing"),
+    ("angrily", "anger"),
+])
+def test_derived_forms_match(word, emotion):
+    assert emotion in get_emotion_weights(f"honestly {word} today")
+
+
+def test_every_single_word_keyword_matches_itself():
+    for emotion, words in EMOTION_KEYWORDS.items():
+        for word in words:
+            if " " not in word:
+                assert get_emotion_weights(word).get(emotion) == words[word], word
+
+
+def test_highest_weight_per_emotion_and_punctuation():
+    assert get_emotion_weights("Sad... no, DEPRESSED!!") == {"sadness": 0.9}
+
+
+def test_phrase_needs_its_words_in_order():
+    assert get_emotion_weights("I'm aching for home") == {"sadness": 0.7, "longing": 0.9}
+    assert get_emotion_weights("for aching reasons") == {"sadness": 0.7}
@@ -0,0 +1,81 @@
+# test_memory_store.py
+"""Memory_Store: per-session shards, LRU residency, group commit and clearing."""
+
+import pytest
+
+from backend.memory.memory_store import Memory_Store
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    # The legacy migration looks for eden_memory.json in the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / "shards"
+
+
+def test_shards_reload_after_restart(root):
+    store = Memory_Store(root)
+    store.save("user", "hi", tags=["greeting"], session_id="a/b c")
+    store.save("kai", "hey", tags=["response"], session_id="a/b c")
+    store.close()
+
+    reopened = Memory_Store(root)
+    assert reopened.sessions == {}
+    assert [e["message"] for e in reopened.get_recent(session_id="a/b c")] == ["hi", "hey"]
+    assert reopened.count_tag("greeting", session_id="a/b c") == 1
+    assert reopened.list_sessions() == ["a/b c"]
+    reopened.close()
+
+
+def test_evicted_session_reloads_from_its_shard(root):
+    store = Memory_Store(root, max_resident_sessions=1)
+    store.save("user", "first", session_id="a")
+    store.save("user", "second", session_id="b")
+    assert list(store.sessions) == ["b"]
+
+    assert [e["message"] for e in store.get_recent(session_id="a")] == ["first"]
+    assert list(store.sessions) == ["a"]
+    store.close()
+
+
+def test_unflushed_sessions_stay_resident_and_listed(root):
+    store = Memory_Store(root, max_resident_sessions=1, write_behind=True, flush_interval_ms=60_000)
+    store.save("user", "first", session_id="a")
+    store.save("user", "second", session_id="b")
+
+    # Neither shard is written yet, so neither may be evicted
+    assert sorted(store.sessions) == ["a", "b"]
+    assert sorted(store.list_sessions()) == ["a", "b"]
+    assert store.flush() == 2
+    store.get_recent(session_id="c")
+    assert len(store.sessions) == 1
+    store.close()
+
+
+def test_clear_survives_restart(root):
+    store = Memory_Store(root)
+    store.save("user", "gone", tags=["x"], session_id="a")
+    store.save("user", "kept", session_id="b")
+    store.clear("a")
+    assert store.get_recent(session_id="a") == []
+    assert store.count_tag("x", session_id="a") == 0
+    store.close()
+
+    reopened = Memory_Store(root)
+    assert reopened.get_recent(session_id="a") == []
+    assert [e["message"] for e in reopened.get_recent(session_id="b")] == ["kept"]
+    reopened.clear_all()
+    assert reopened.list_sessions() == []
+    reopened.close()
+
+
+def test_clear_drops_queued_entries(root):
+    store = Memory_Store(root, write_behind=True, flush_interval_ms=60_000)
+    store.save("user", "queued", session_id="a")
+    store.clear("a")
+    assert store.flush() == 0
+    store.close()
+
+    reopened = Memory_Store(root)
+    assert reopened.get_recent(session_id="a") == []
+    reopened.close()
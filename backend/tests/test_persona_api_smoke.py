@@ -0,0 +1,94 @@
+# test_persona_api_smoke.py
+"""One chat turn through the WebSocket handler on the dummy backend.
+
+Needs the API's own dependencies (fastapi, torch, transformers, ...);
+skipped where they are not installed. The vector store is replaced with
+an in-memory stand-in so no embedding model is downloaded.
+"""
+
+import os
+
+import pytest
+
+for module in ("fastapi", "torch", "transformers", "jose", "passlib", "structlog", "vaderSentiment"):
+    pytest.importorskip(module)
+
+
+class _NoVectors:
+    def begin_turn(self, user_msg):
+        return None
+
+    async def aget_contextual_memory(self, *args, **kwargs):
+        return []
+
+    async def asave_interaction(self, *args, **kwargs):
+        pass
+
+    def build_emotional_context(self, emotions, affect):
+        return ""
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(scope="module")
+def api(tmp_path_factory):
+    # Stores write relative to the working directory at import time
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("api"))
+    os.environ["VECTOR_DB_PATH"] = ""
+    try:
+        from backend.api import persona_api
+        from backend.inference.backends import PipelineBackend
+
+        persona_api.vector_store = _NoVectors()
+        persona_api.inference_backend = PipelineBackend(persona_api.DummyGenerator(), name="dummy")
+        persona_api.inference_worker.start()
+        persona_api.model_state["ready"] = True
+        yield persona_api
+        persona_api.inference_worker.stop()
+        persona_api.memory_store.close()
+    finally:
+        os.chdir(cwd)
+
+
+def _turn(client, message, **extra):
+    frames = []
+    with client.websocket_connect("/ws/smoke-user") as ws:
+        ws.send_json({"message": message, "persona": "kai", **extra})
+        while True:
+            frame = ws.receive_json()
+            frames.append(frame)
+            if frame["type"] in ("message", "error"):
+                return frames
+
+
+def test_one_turn_on_dummy_backend(api):
+    from fastapi.testclient import TestClient
+
+    frames = _turn(TestClient(api.app), "I feel a bit lost today")
+    assert frames[-1]["type"] == "message", frames
+    assert frames[-1]["content"] == "Hey! What's up?"
+
+
+def test_streamed_deltas_match_final_reply(api):
+    from fastapi.testclient import TestClient
+
+    frames = _turn(TestClient(api.app), "I feel a bit lost today", stream=True)
+    deltas = [f["content"] for f in frames if f["type"] == "delta"]
+    assert frames[-1]["type"] == "message", frames
+    assert "".join(deltas) == frames[-1]["content"]
+
+
+@pytest.mark.parametrize("raw, reply", [
+    (" Kai: Hey there!\nUser: and then", "Hey there!"),
+    ("Eden:  I'm   here\n\nfor you. You: ok", "I'm here for you."),
+    ("Sure.\nKai: again", "Sure."),
+    ("Youth is great.", "Youth is great."),
+])
+def test_reply_filter_chunked(api, raw, reply):
+    for size in (1, 2, 5, len(raw)):
+        reply_filter = api.ReplyFilter()
+        streamed = "".join(reply_filter.feed(raw[i:i + size]) for i in range(0, len(raw), size))
+        streamed += reply_filter.finish()
+        assert streamed == reply_filter.reply == reply
@@ -0,0 +1,72 @@
+# test_sql_memory_store.py
+"""SqlMemoryStore: ordering, filters, tags and bulk import."""
+
+import pytest
+
+from backend.memory.memory_store import Memory_Store
+from backend.memory.sql_memory_store import SqlMemoryStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SqlMemoryStore(tmp_path / "memory.db")
+    yield store
+    store.close()
+
+
+def test_get_recent_is_oldest_first_with_tags(store):
+    store.save("user", "hi", tags=["greeting"], session_id="a")
+    store.save("kai", "hey", tags=["response", "warm"], session_id="a")
+    store.save("user", "elsewhere", session_id="b")
+
+    recent = store.get_recent(limit=10, session_id="a")
+    assert [e["message"] for e in recent] == ["hi", "hey"]
+    assert [e["tags"] for e in recent] == [["greeting"], ["response", "warm"]]
+    assert [e["message"] for e in store.get_recent(limit=1, session_id="a")] == ["hey"]
+
+
+def test_speaker_and_tag_filters(store):
+    store.save("user", "one", tags=["x"], session_id="a")
+    store.save("kai", "two", tags=["x"], session_id="a")
+    store.save("user", "three", tags=["y"], session_id="a")
+
+    assert [e["message"] for e in store.get_recent(session_id="a", speaker="user")] == ["one", "three"]
+    assert [e["message"] for e in store.get_recent(session_id="a", tag_filter=["x"])] == ["one", "two"]
+    assert store.count_tag("x", session_id="a") == 2
+    assert store.tag_counts(session_id="a") == {"x": 2, "y": 1}
+
+
+def test_get_recent_beyond_the_sql_variable_limit(store):
+    # More rows than SQLite allows bound parameters in one statement
+    n = 33_000
+    store.import_sessions({"big": [{"speaker": "user", "message": f"m{i}", "tags": ["t"]} for i in range(n)]})
+
+    recent = store.get_recent(limit=n, session_id="big")
+    assert len(recent) == n
+    assert recent[-1] == {"timestamp": "", "speaker": "user", "message": f"m{n - 1}", "emotion": "neutral", "tags": ["t"]}
+
+
+def test_clear_removes_messages_and_tags(store):
+    store.save("user", "hi", tags=["x"], session_id="a")
+    store.save("user", "keep", tags=["x"], session_id="b")
+    store.clear("a")
+
+    assert store.get_recent(session_id="a") == []
+    assert store.count_tag("x", session_id="a") == 0
+    assert store.count_tag("x", session_id="b") == 1
+
+
+def test_import_from_a_sharded_memory_store(tmp_path, store, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = Memory_Store(tmp_path / "shards")
+    source.save("user", "hi", session_id="a")
+    source.save("kai", "hey", tags=["response"], session_id="a")
+    source.save("user", "yo", session_id="b")
+    source.close()
+
+    # A fresh store has no session resident; the import still walks all of them
+    reopened = Memory_Store(tmp_path / "shards")
+    assert store.import_sessions(reopened) == 3
+    assert [e["message"] for e in store.get_recent(session_id="a")] == ["hi", "hey"]
+    assert sorted(store.list_sessions()) == ["a", "b"]
+    reopened.close()
@@ -0,0 +1,132 @@
+# test_vector_store.py
+"""SessionIndex, legacy-variant search and the vector stores' write-behind bookkeeping."""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+chromadb = pytest.importorskip("chromadb")
+
+from backend.memory import vector_memory_store
+from backend.memory.numpy_vector_store import INITIAL_ROWS, NumpyVectorMemoryStore, SessionIndex
+from backend.memory.vector_memory_store import VectorMemoryStore
+
+
+class _NoHistory:
+    def list_sessions(self):
+        return []
+
+    def get_recent(self, **kwargs):
+        return []
+
+
+# ----------------------------------------------------
+# SessionIndex
+# ----------------------------------------------------
+def _unit_rows(n: int, dim: int = 8, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_session_index_search_ranks_by_cosine():
+    index = SessionIndex(dim=8)
+    vectors = _unit_rows(5)
+    index.add([f"r{i}" for i in range(5)], [f"doc{i}" for i in range(5)], vectors, [{}] * 5)
+
+    hits = index.search(3.0 * vectors[2], k=2)
+    assert hits[0][0] == 2
+    assert hits[0][1] == pytest.approx(1.0, abs=1e-5)
+    assert len(hits) == 2 and hits[0][1] >= hits[1][1]
+
+
+def test_session_index_grows_and_upserts_in_place():
+    index = SessionIndex(dim=8)
+    n = INITIAL_ROWS + 5
+    index.add([f"r{i}" for i in range(n)], ["doc"] * n, _unit_rows(n), [{}] * n)
+    index.add(["r0"], ["updated"], _unit_rows(1, seed=1), [{"v": 2}])
+
+    assert index.size == n
+    assert index.documents[0] == "updated" and index.metadatas[0] == {"v": 2}
+
+
+def test_session_index_remove_compacts_rows():
+    index = SessionIndex(dim=8)
+    vectors = _unit_rows(4)
+    index.add(["a", "b", "c", "d"], ["A", "B", "C", "D"], vectors, [{}] * 4)
+    index.remove({"b", "d"})
+
+    assert index.ids == ["a", "c"] and index.documents == ["A", "C"]
+    assert index._row_of == {"a": 0, "c": 1}
+    assert index.search(vectors[2], k=1)[0][0] == 1
+
+
+# ----------------------------------------------------
+# legacy-variant search
+# ----------------------------------------------------
+def _legacy_collection(path, pipeline):
+    turns = [("hello there", "hi!"), ("i am sad", "I'm sorry")]
+    collection = chromadb.PersistentClient(path=str(path)).get_or_create_collection(
+        "conversations", metadata={"hnsw:space": "cosine"}
+    )
+    # Written before embedding variants were recorded in the metadata
+    collection.add(
+        ids=["s_1", "s_2"],
+        documents=[f"User: {u}\nAI: {r}" for u, r in turns],
+        embeddings=pipeline.encode_many([pipeline.conversation_text(u, r) for u, r in turns]),
+        metadatas=[
+            {"session_id": "s", "timestamp": "t", "emotions": "{}", "user_message": u, "ai_response": r}
+            for u, r in turns
+        ],
+    )
+
+
+def test_legacy_rows_stay_searchable_until_a_full_rebuild(tmp_path, embedding_pipeline):
+    path = tmp_path / "vectors"
+    _legacy_collection(path, embedding_pipeline)
+
+    store = VectorMemoryStore(embedding_pipeline=embedding_pipeline, path=path)
+    store.save_interaction("a new turn", "ok", {}, "s")
+    store._executor.shutdown()
+
+    # A restart after one turn was saved under the new variant
+    reopened = VectorMemoryStore(embedding_pipeline=embedding_pipeline, path=path)
+    assert reopened.needs_rebuild()
+    assert len(reopened.get_contextual_memory("i am sad", "s", limit=5)) == 3
+
+    reopened.rebuild_from(_NoHistory())
+    assert not reopened.needs_rebuild()
+    assert len(reopened.get_contextual_memory("i am sad", "s", limit=5)) == 3
+    reopened.close()
+
+
+# ----------------------------------------------------
+# write-behind and aggregates
+# ----------------------------------------------------
+def test_a_failing_record_does_not_block_the_batch(embedding_pipeline):
+    store = VectorMemoryStore(embedding_pipeline=embedding_pipeline, path=None, write_behind=True,
+                              flush_interval_ms=60_000)
+    store.save_interaction("good", "ok", {}, "s")
+    store.save_interaction("bad", "ok", {}, "s")
+    store._pending[-1]["metadata"]["broken"] = {"not": "a scalar"}
+    store.save_interaction("also good", "ok", {}, "s")
+
+    for _ in range(vector_memory_store.MAX_FLUSH_ATTEMPTS):
+        with pytest.raises(Exception):      # Chroma rejects the nested metadata
+            store.flush()
+    assert store.count() == 2
+    assert store._pending == []
+    assert [r["metadata"]["user_message"] for r in store.dead_letters] == ["bad"]
+    store.close()
+
+
+def test_aggregates_are_evicted_and_rebuilt(embedding_pipeline):
+    store = NumpyVectorMemoryStore(embedding_pipeline=embedding_pipeline)
+    store.max_resident_aggregates = 2
+    for session_id in ("a", "b", "c"):
+        store.save_interaction(f"i feel sad in {session_id}", "ok", {"sadness": 0.9}, session_id)
+        store.save_interaction(f"still sad in {session_id}", "ok", {"sadness": 0.8}, session_id)
+
+    assert list(store._session_aggregates) == ["b", "c"]
+    assert store.get_memory_stats("a")["emotional_breakdown"] == {"sadness": 2}
+    assert list(store._session_aggregates) == ["c", "a"]
+    assert store.get_emotion_summary("a")["total_interactions"] == 2
+    store.close()
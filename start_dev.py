@@ -26,6 +26,9 @@ def main():
             f.write("HF_TOKEN=your-huggingface-token-here\n")
         print("Basic .env file created. Please update with your actual tokens.")
     
+    # Fall back to canned replies when the model can't load on a dev machine
+    os.environ.setdefault("ALLOW_DUMMY_BACKEND", "1")
+
     # Start the server
     try:
         uvicorn.run(